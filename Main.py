@@ -1,3 +1,11 @@
+import argparse
+import glob
+import logging
+import os
+import sys
+import threading
+import time
+
 import dash
 from dash import dcc, html, Input, Output, State
 import pandas as pd
@@ -5,21 +13,238 @@ import plotly.express as px
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output
 import dash_table
+import flask
 from dash.exceptions import PreventUpdate
 
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP, 'https://use.fontawesome.com/releases/v5.8.1/css/all.css'], suppress_callback_exceptions=True)
+import aggregates
+import data_loader
+import downsample
+import order_import
+import table_export
+import table_query
+import wire_format
+from callback_metrics import CallbackMetrics, count_rows
+from backends import PandasBackend, SqlBackend
+from figure_cache import FigureCache, code_digest
+from orders_store import OrdersStore
+
+logger = logging.getLogger(__name__)
+
+
+# diskcache writes of a job run in the server process, under the lock forks take
+class _LockedCache:
+    def __init__(self, cache, lock):
+        self._cache = cache
+        self._lock = lock
+
+    def set(self, key, value):
+        with self._lock:
+            return self._cache.set(key, value)
+
+
+# At most `max_jobs` background job processes at a time. When all of them are busy a call
+# runs in the request thread instead, as if it were not a background callback, rather than
+# waiting for a slot. Jobs running longer than `job_timeout` seconds are killed when a slot
+# is looked for (a job stuck on a lock it inherited must not hold its slot forever).
+class BoundedDiskcacheManager(dash.DiskcacheManager):
+    def __init__(self, cache, max_jobs, job_timeout):
+        self.max_jobs = max_jobs
+        self.job_timeout = job_timeout
+        self._jobs = []
+        self._slots_lock = threading.Lock()
+        # Held while forking and around this process's own diskcache calls: a job forked
+        # while another thread is inside a SQLite transaction on the cache inherits that
+        # lock as held by itself and waits on it forever
+        self._cache_lock = threading.RLock()
+        self._inline_jobs = {}
+        # Registers the callbacks (make_job_fn), so it comes last
+        super().__init__(cache)
+
+    def make_job_fn(self, fn, progress, key=None):
+        from dash.long_callback.managers.diskcache_manager import _make_job_fn
+
+        job_fn = super().make_job_fn(fn, progress, key)
+        self._inline_jobs[job_fn] = _make_job_fn(fn, _LockedCache(self.handle, self._cache_lock), progress)
+        return job_fn
+
+    # Job 0 stands for a call that has already run in the request thread: the first poll
+    # returns its result
+    def call_job_fn(self, key, job_fn, args, context):
+        from multiprocess import Process
+
+        with self._slots_lock:
+            self._reap()
+            if len(self._jobs) < self.max_jobs:
+                job = Process(target=job_fn, args=(key, self._make_progress_key(key), args, context))
+                with self._cache_lock:
+                    job.start()
+                self._jobs.append((job, time.monotonic()))
+                return job.pid
+        logger.info("All %d background callback jobs are busy, running the call in the request thread", self.max_jobs)
+        self._inline_jobs[job_fn](key, self._make_progress_key(key), args, context)
+        return 0
+
+    # A job is done once its sentinel is ready. Not is_alive(): jobs whose result has been
+    # fetched are killed and reaped through psutil, which multiprocess does not notice.
+    def _reap(self):
+        from multiprocess import connection
+
+        if not self._jobs:
+            return
+        done = set(connection.wait([job.sentinel for job, _ in self._jobs], 0))
+        now = time.monotonic()
+        running = []
+        for job, started in self._jobs:
+            if job.sentinel in done:
+                continue
+            if now - started > self.job_timeout:
+                logger.warning("Killing background callback job %s after %.0fs", job.pid, now - started)
+                self.terminate_job(job.pid)
+                continue
+            running.append((job, started))
+        self._jobs = running
+
+    # `job` comes from the poll's query string; "0" (ran inline) is no process to look at or
+    # kill (psutil reports pid 0 as existing)
+    def job_running(self, job):
+        return bool(job) and int(job) != 0 and super().job_running(job)
+
+    def terminate_job(self, job):
+        if not job or int(job) == 0:
+            return
+        with self._cache_lock:
+            super().terminate_job(job)
+
+    def get_progress(self, key):
+        with self._cache_lock:
+            return super().get_progress(key)
+
+    def result_ready(self, key):
+        with self._cache_lock:
+            return super().result_ready(key)
+
+    def get_result(self, key, job):
+        with self._cache_lock:
+            return super().get_result(key, job)
+
+    def clear_cache_entry(self, key):
+        with self._cache_lock:
+            super().clear_cache_entry(key)
+
+
+# Figure callbacks can run as Dash background callbacks (DASHBOARD_BACKGROUND=1): each call
+# is handed to a local process (diskcache manager, no broker), so a heavy Daily/full-range
+# query no longer ties up a request thread. This is opt-in: every call forks, cache hits
+# included, and the figure cache and callback metrics filled in the job process are lost
+# with it, so for the usual cached figures it is several times slower than running them
+# synchronously like every other callback (the default, also without diskcache/multiprocess).
+# DASHBOARD_BACKGROUND_JOBS caps the job processes (default: one per CPU) and
+# DASHBOARD_BACKGROUND_TIMEOUT the seconds a job may run (default 300).
+def make_background_manager():
+    if os.environ.get("DASHBOARD_BACKGROUND", "0") != "1":
+        return None
+    try:
+        import diskcache
+        max_jobs = int(os.environ.get("DASHBOARD_BACKGROUND_JOBS") or os.cpu_count() or 1)
+        job_timeout = float(os.environ.get("DASHBOARD_BACKGROUND_TIMEOUT") or 300)
+        return BoundedDiskcacheManager(diskcache.Cache(os.path.join(data_loader.cache_dir_for("orders.xlsx"), "background")),
+                                       max_jobs, job_timeout)
+    except ImportError:
+        return None
+
+
+background_manager = make_background_manager()
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP, 'https://use.fontawesome.com/releases/v5.8.1/css/all.css'], suppress_callback_exceptions=True,
+                background_callback_manager=background_manager)
 server=app.server
 
+# Per-callback timings, rows and payload sizes, scraped from /metrics. With
+# DASHBOARD_SLOW_CALLBACK_SECONDS set, slower callbacks are logged with their inputs.
+slow_callback_seconds = os.environ.get("DASHBOARD_SLOW_CALLBACK_SECONDS")
+callback_metrics = CallbackMetrics(slow_seconds=float(slow_callback_seconds) if slow_callback_seconds else None)
+callback_metrics.instrument(app)
+# Callback results are converted for the orjson fast path (figure floats optionally rounded,
+# DASHBOARD_FIGURE_DECIMALS) and callback responses are sent gzip/brotli-compressed
+wire_format.install(app, decimals=wire_format.figure_decimals())
+
+
+@server.route("/metrics")
+def metrics():
+    return flask.Response(callback_metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+# Download of the Table page view, streamed in chunks as CSV or Parquet (needs pyarrow).
+# Takes the table's Category/Sub-Category, its filter_query and `sort=column:asc|desc`
+# parameters; the export links on the Table page are kept in sync with them.
+@server.route("/export/orders.<fmt>")
+def export_orders(fmt):
+    if fmt not in ("csv", "parquet"):
+        flask.abort(404)
+    if fmt == "parquet" and not table_export.parquet_available():
+        flask.abort(501, "Parquet export needs pyarrow")
+    args = flask.request.args
+    filters = {'Category': args.get("category") or None, 'Sub-Category': args.get("sub_category") or None}
+    sort_by = []
+    for sort in args.getlist("sort"):
+        column, _, direction = sort.rpartition(":")
+        sort_by.append({'column_id': column, 'direction': 'desc' if direction == 'desc' else 'asc'})
+    orders_backend.refresh()
+    columns = orders_backend.columns()
+    chunks = orders_backend.iter_table_rows(filters, args.get("filter_query", ""), sort_by)
+    if fmt == "csv":
+        body, mimetype = table_export.csv_chunks(chunks, columns), "text/csv"
+    else:
+        body, mimetype = table_export.parquet_chunks(chunks, columns), "application/vnd.apache.parquet"
+    return flask.Response(flask.stream_with_context(body), mimetype=mimetype,
+                          headers={"Content-Disposition": f"attachment; filename=orders.{fmt}"})
+
+
+# app.callback for the heavy figure callbacks; `running` (component, while, after) tuples
+# only apply in background mode
+def heavy_callback(*args, running=None, **kwargs):
+    if background_manager is None:
+        return app.callback(*args, **kwargs)
+    return app.callback(*args, background=True, running=running, **kwargs)
+
 orders_data = []
-# Load your DataFrames
-orders_df = pd.read_excel("orders.xlsx", sheet_name="Orders")
-returns_df = pd.read_excel("Returns.xlsx", sheet_name="Returns")
-customers_df = pd.read_excel("Peoples.xlsx", sheet_name="People")
+# High-cardinality Add Entry dropdowns (component id -> column); their options are looked up
+# in a prefix index of distinct values as the user types instead of being shipped in the layout
+SEARCHABLE_DROPDOWNS = {
+    'customer-id': 'Customer ID',
+    'customer-name': 'Customer Name',
+    'city': 'City',
+    'product-id': 'Product ID',
+    'product-name': 'Product Name',
+}
+
+# Load your DataFrames (served from the columnar cache in .cache/, rebuilt when a workbook changes)
+# Orders live in an OrdersStore: cached workbook + append-only journal of Add Entry inserts,
+# the journal rows indexed separately until the compactor folds them in. The journal is shared by
+# all worker processes; callbacks call orders_backend.refresh() to pick up rows other workers added.
+# DASHBOARD_EXPORT_XLSX=0 makes compaction keep the rows in the columnar cache only, without
+# rewriting orders.xlsx (the slow part of compacting a large workbook).
+# With DASHBOARD_DATABASE_URL set (e.g. sqlite:///orders.db, filled by `python backends.py URL`)
+# the callbacks query that database instead and no worker loads the orders into memory.
+returns_df = data_loader.load_returns("Returns.xlsx")
+customers_df = data_loader.load_people("Peoples.xlsx")
+# Region -> regional manager, from the People sheet
+region_managers = dict(zip(customers_df['Region'].astype(str), customers_df['Person'].astype(str)))
+returned_order_ids = returns_df.loc[returns_df['Returned'] == 'Yes', 'Order ID']
+database_url = os.environ.get("DASHBOARD_DATABASE_URL")
+if database_url:
+    orders_backend = SqlBackend(database_url, returned_order_ids=returned_order_ids, region_managers=region_managers)
+else:
+    export_xlsx = os.environ.get("DASHBOARD_EXPORT_XLSX", "1") != "0"
+    orders_store = OrdersStore("orders.xlsx", export_xlsx=export_xlsx, searchable_columns=SEARCHABLE_DROPDOWNS.values(),
+                               returned_order_ids=returned_order_ids, region_managers=region_managers)
+    orders_store.start_compactor()
+    orders_backend = PandasBackend(orders_store)
 
-# Pre-process the data
-orders_df['Order Date'] = pd.to_datetime(orders_df['Order Date'])
-orders_df['Ship Date'] = pd.to_datetime(orders_df['Ship Date'])
-orders_df['Days to Ship'] = (orders_df['Ship Date'] - orders_df['Order Date']).dt.days
+# Results of the figure callbacks, keyed on their inputs and the dataset version; on disk
+# also on the data source and this code, so neither an edited workbook nor a deploy is
+# answered with old results
+figure_cache = FigureCache(max_entries=256, cache_dir=os.path.join(data_loader.cache_dir_for("orders.xlsx"), "figures"),
+                           namespace=code_digest(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))))
 
 # Function to create a KPI card
 def create_kpi_card(title, value, trend_value, trend_icon, color):
@@ -104,20 +329,26 @@ sidebar = html.Div(
 )
 
 # Toggle Sidebar Callback
-@app.callback(
+# Runs in the browser: flipping `left` and the icon needs no data from the server
+app.clientside_callback(
+    """
+    function(n, sidebar_style, toggle_button_children) {
+        if (!n) {
+            return [sidebar_style, toggle_button_children];
+        }
+        var open = sidebar_style.left === "0px";
+        var icon = {
+            namespace: "dash_html_components",
+            type: "I",
+            props: {className: open ? "fas fa-bars" : "fas fa-times"}
+        };
+        return [Object.assign({}, sidebar_style, {left: open ? "-200px" : "0px"}), [icon]];
+    }
+    """,
     [Output("sidebar", "style"), Output("sidebar-toggle", "children")],
     [Input("sidebar-toggle", "n_clicks")],
     [State("sidebar", "style"), State("sidebar-toggle", "children")],
 )
-def toggle_sidebar(n, sidebar_style, toggle_button_children):
-    if n:
-        if sidebar_style["left"] == "0px":
-            sidebar_style["left"] = "-200px"
-            toggle_button_children = [html.I(className="fas fa-bars")]
-        else:
-            sidebar_style["left"] = "0px"
-            toggle_button_children = [html.I(className="fas fa-times")]
-    return sidebar_style, toggle_button_children
 
 
 app.layout = html.Div(
@@ -141,15 +372,45 @@ app.layout = html.Div(
               [Input('url', 'pathname')])
 def display_page(pathname):
     if pathname == '/Table':
-        return table_page_layout()
+        return cached_for_version('table-page', table_page_layout)
     elif pathname == '/graph':
-        return graph_page_layout()
+        return cached_for_version('graph-page', graph_page_layout)
     else:
-        return dashboard_page_layout()  # Default to dashboard layout
+        return cached_for_version('dashboard-page', dashboard_page_layout)  # Default to dashboard layout
+
+
+# Page layouts and the option lists/date bounds they are built from, kept until the
+# dataset version changes (i.e. until a row is inserted by any worker)
+layout_cache = {}
+
+
+def cached_for_version(name, build):
+    version = orders_backend.refresh()
+    entry = layout_cache.get(name)
+    if entry is None or entry[0] != version:
+        entry = (version, build())
+        layout_cache[name] = entry
+    return entry[1]
+
+
+# Columns whose distinct values are offered as dropdown options on the pages
+LAYOUT_OPTION_COLUMNS = ['Category', 'Sub-Category', 'Ship Mode', 'Segment', 'Country', 'State', 'Region']
+
+
+def layout_metadata():
+    def build():
+        first_order, last_order = orders_backend.bounds('Order Date')
+        return {
+            'first_order': first_order,
+            'last_order': last_order,
+            'columns': orders_backend.columns(),
+            'options': {col: [{'label': i, 'value': i} for i in orders_backend.distinct(col)] for col in LAYOUT_OPTION_COLUMNS},
+        }
+    return cached_for_version('metadata', build)
 
 
 def dashboard_page_layout():
-    # Assume orders_df and customers_df are defined somewhere and accessible
+    meta = layout_metadata()
     return html.Div([
         dbc.Row(
             [
@@ -159,9 +420,9 @@ def dashboard_page_layout():
                             dbc.Row(
                                 [
                                     dbc.Col(html.Label("Start Date"), width=2),
-                                    dbc.Col(dcc.DatePickerSingle(id='start-date-picker', date=orders_df['Order Date'].min()), width=2),
+                                    dbc.Col(dcc.DatePickerSingle(id='start-date-picker', date=meta['first_order']), width=2),
                                     dbc.Col(html.Label("End Date"), width=2),
-                                    dbc.Col(dcc.DatePickerSingle(id='end-date-picker', date=orders_df['Order Date'].max()), width=2),
+                                    dbc.Col(dcc.DatePickerSingle(id='end-date-picker', date=meta['last_order']), width=2),
                                     dbc.Col(html.Label("Select Region"), width=2),
                                     dbc.Col(dcc.Dropdown(id='region-dropdown', options=[{'label': r, 'value': r} for r in customers_df['Region'].unique()], value=customers_df['Region'].unique()[0]), width=2),
                                 ]
@@ -171,13 +432,16 @@ def dashboard_page_layout():
                                 [
                                     dbc.Col(html.Label("Date Granularity"), width=2),
                                     dbc.Col(dcc.Dropdown(id='granularity-dropdown', options=[{'label': 'Daily', 'value': 'D'}, {'label': 'Monthly', 'value': 'M'}, {'label': 'Yearly', 'value': 'Y'}], value='M'), width=2),
+                                    dbc.Col(html.Label("Regional Manager"), width=2),
+                                    dbc.Col(dcc.Dropdown(id='manager-dropdown', options=[{'label': m, 'value': m} for m in sorted(set(region_managers.values()))], value=None, placeholder="All managers"), width=2),
                                 ]
                             ),
                             dbc.Row(
                                 [
-                                    dbc.Col(create_kpi_card("Sales", "Loading...", "Loading...", "minus", "primary"), id="sales-kpi", width=4),
-                                    dbc.Col(create_kpi_card("Profit Ratio", "Loading...", "Loading...", "minus", "danger"), id="profit-kpi", width=4),
-                                    dbc.Col(create_kpi_card("Avg Days to Ship", "Loading...", "Loading...", "minus", "warning"), id="shipping-kpi", width=4),
+                                    dbc.Col(create_kpi_card("Sales", "Loading...", "Loading...", "minus", "primary"), id="sales-kpi", width=3),
+                                    dbc.Col(create_kpi_card("Profit Ratio", "Loading...", "Loading...", "minus", "danger"), id="profit-kpi", width=3),
+                                    dbc.Col(create_kpi_card("Avg Days to Ship", "Loading...", "Loading...", "minus", "warning"), id="shipping-kpi", width=3),
+                                    dbc.Col(create_kpi_card("Return Rate", "Loading...", "Loading...", "minus", "info"), id="returns-kpi", width=3),
                                 ],
                                 className="mb-4",
                             ),
@@ -195,7 +459,8 @@ def dashboard_page_layout():
 
                             # Graphs
                             dbc.Row(
-                                    [
+                                    id='trend-graphs',
+                                    children=[
                                         dbc.Col(dcc.Graph(id='sales-trend-graph', style={'marginTop': 20}), width=4),
                                         dbc.Col(dcc.Graph(id='profit-trend-graph', style={'marginTop': 20}), width=4),
                                         dbc.Col(dcc.Graph(id='shipping-time-trend-graph', style={'marginTop': 20}), width=4),
@@ -209,16 +474,8 @@ def dashboard_page_layout():
             ],
         ),
     ])
-# Function to generate line graphs for trends with granularities
-def generate_trend_graph(df, x, y, title, granularity='M'):
-    df[y] = pd.to_numeric(df[y], errors='coerce')
-    df = df.dropna(subset=[y])
-    if granularity == 'M':
-        df = df.resample('M', on=x).agg({y: 'mean'}).reset_index()
-    elif granularity == 'Y':
-        df = df.resample('A', on=x).agg({y: 'mean'}).reset_index()
-    elif granularity == 'D':
-        df = df.set_index(x).resample('D').agg({y: 'mean'}).reset_index()
+# Function to draw an already aggregated trend (see aggregates.trend / rollup)
+def plot_trend(df, x, y, title):
     fig = px.line(df, x=x, y=y)
     fig.update_layout(
         margin=dict(l=20, r=20, t=50, b=20),  # Add top margin to the plot's internal name
@@ -227,40 +484,132 @@ def generate_trend_graph(df, x, y, title, granularity='M'):
     )
     fig.update_traces(line=dict(width=3))
     return fig
+# KPI numbers from a totals dict (see aggregates.PrefixSums.totals)
+def kpi_values(totals):
+    sales = totals['Sales sum']
+    return {
+        'sales': sales,
+        'profit_ratio': totals['Profit sum'] / sales * 100 if sales else float('nan'),
+        'days_to_ship': totals['Days to Ship mean'],
+        'return_rate': totals['Returned mean'] * 100,
+        'net_sales': sales - totals['Returned Sales sum'],
+    }
+
+
+# Trend line for a KPI card: change vs the previous period and vs a year ago, with the
+# arrow following the change vs the previous period. `unit` is 'pct' (relative change),
+# 'pp' (percentage points) or 'days' (absolute change).
+def describe_changes(kpis, compare, key, unit):
+    current = kpis[key]
+    parts, icon = [], "minus"
+    for name, label in [('previous', 'vs prev. period'), ('year_ago', 'YoY')]:
+        previous = compare[name][key]
+        if pd.isna(current) or pd.isna(previous) or (unit == 'pct' and previous == 0):
+            parts.append(f"n/a {label}")
+            continue
+        if unit == 'pct':
+            change = (current - previous) / abs(previous) * 100
+            parts.append(f"{change:+.1f}% {label}")
+        elif unit == 'pp':
+            change = current - previous
+            parts.append(f"{change:+.1f} pp {label}")
+        else:
+            change = current - previous
+            parts.append(f"{change:+.1f} days {label}")
+        if name == 'previous' and round(change, 1):
+            icon = "arrow-up" if change > 0 else "arrow-down"
+    return " | ".join(parts), icon
+
+
+# Choosing a manager narrows the region dropdown to their regions and clears the pick,
+# so the dashboard shows all of them until a single region is chosen
+@app.callback(
+    [Output('region-dropdown', 'options'), Output('region-dropdown', 'value')],
+    Input('manager-dropdown', 'value'),
+    prevent_initial_call=True,
+)
+def restrict_regions(manager):
+    regions = [r for r, m in region_managers.items() if manager is None or m == manager]
+    return [{'label': r, 'value': r} for r in regions], (None if manager else dash.no_update)
+
+
+# A picked region wins; with the region cleared, a manager selects all of their regions
+def dashboard_regions(region, manager):
+    if not region and manager:
+        return sorted(r for r, m in region_managers.items() if m == manager)
+    return region
+
+
+# KPI cards are prefix-sum lookups and answer immediately; the trend figures below are
+# computed separately (in the background when enabled) and stream in after them
 @app.callback(
     [
-        Output('sales-trend-graph', 'figure'),
-        Output('profit-trend-graph', 'figure'),
-        Output('shipping-time-trend-graph', 'figure'),
         Output('sales-kpi', 'children'),
         Output('profit-kpi', 'children'),
         Output('shipping-kpi', 'children'),
+        Output('returns-kpi', 'children'),
     ],
     [
         Input('start-date-picker', 'date'),
         Input('end-date-picker', 'date'),
         Input('region-dropdown', 'value'),
-        Input('granularity-dropdown', 'value'),
+        Input('manager-dropdown', 'value'),
     ]
 )
-def update_graphs_and_kpis(start_date, end_date, region, granularity):
-    filtered_df = orders_df[(orders_df['Order Date'] >= start_date) & (orders_df['Order Date'] <= end_date)]
-    filtered_df = filtered_df[filtered_df['Region'] == region]
-    sales_fig = generate_trend_graph(filtered_df, 'Order Date', 'Sales', 'Sales Trend', granularity)
-    profit_fig = generate_trend_graph(filtered_df, 'Order Date', 'Profit', 'Profit Trend', granularity)
-    shipping_time_fig = generate_trend_graph(filtered_df, 'Order Date', 'Days to Ship', 'Shipping Time Trend', granularity)
-    # Calculate KPI values
-    total_sales = filtered_df['Sales'].sum()
-    total_profit = filtered_df['Profit'].sum()
-    avg_shipping_time = filtered_df['Days to Ship'].mean()
+def update_kpis(start_date, end_date, region, manager):
+    orders_backend.refresh()
+    region = dashboard_regions(region, manager)
+    # Calculate KPI values for the selected range and the comparison periods (prefix-sum lookups)
+    kpis = kpi_values(orders_backend.totals(start_date, end_date, region))
+    compare = {
+        name: kpi_values(orders_backend.totals(period_start, period_end, region))
+        for name, (period_start, period_end) in aggregates.comparison_periods(start_date, end_date).items()
+    }
     # Update KPI cards with actual values and trends
-    sales_kpi_card = create_kpi_card("Sales", f"${total_sales:,.2f}", "Trend Placeholder", "arrow-up", "primary")
-    profit_kpi_card = create_kpi_card("Profit Ratio", f"{total_profit:,.2f}%", "Trend Placeholder", "arrow-down", "danger")
-    shipping_kpi_card = create_kpi_card("Avg Days to Ship", f"{avg_shipping_time:.1f} days", "Trend Placeholder", "minus", "warning")
-    return sales_fig, profit_fig, shipping_time_fig, sales_kpi_card, profit_kpi_card, shipping_kpi_card
+    sales_trend, sales_icon = describe_changes(kpis, compare, 'sales', 'pct')
+    profit_trend, profit_icon = describe_changes(kpis, compare, 'profit_ratio', 'pp')
+    shipping_trend, shipping_icon = describe_changes(kpis, compare, 'days_to_ship', 'days')
+    returns_trend, returns_icon = describe_changes(kpis, compare, 'return_rate', 'pp')
+    sales_kpi_card = create_kpi_card("Sales", f"${kpis['sales']:,.2f}", sales_trend, sales_icon, "primary")
+    profit_kpi_card = create_kpi_card("Profit Ratio", f"{kpis['profit_ratio']:.2f}%", profit_trend, profit_icon, "danger")
+    shipping_kpi_card = create_kpi_card("Avg Days to Ship", f"{kpis['days_to_ship']:.1f} days", shipping_trend, shipping_icon, "warning")
+    returns_kpi_card = create_kpi_card("Return Rate", f"{kpis['return_rate']:.2f}% (net sales ${kpis['net_sales']:,.2f})",
+                                       returns_trend, returns_icon, "info")
+    return sales_kpi_card, profit_kpi_card, shipping_kpi_card, returns_kpi_card
+
+
+@heavy_callback(
+    [
+        Output('sales-trend-graph', 'figure'),
+        Output('profit-trend-graph', 'figure'),
+        Output('shipping-time-trend-graph', 'figure'),
+    ],
+    [
+        Input('start-date-picker', 'date'),
+        Input('end-date-picker', 'date'),
+        Input('region-dropdown', 'value'),
+        Input('granularity-dropdown', 'value'),
+        Input('manager-dropdown', 'value'),
+    ],
+    running=[(Output('trend-graphs', 'style'), {'opacity': 0.5}, {'opacity': 1})],
+)
+@figure_cache.memoize(orders_backend.refresh, lambda: orders_backend.source_id)
+def update_trend_graphs(start_date, end_date, region, granularity, manager):
+    region = dashboard_regions(region, manager)
+    # Everything below is rolled up from the daily cube, never from the order rows
+    cube_slice = orders_backend.daily_cube(start_date, end_date, {'Region': region})
+    count_rows(len(cube_slice))
+    trend = aggregates.rollup(cube_slice, granularity)
+    trend['Net Sales'] = trend['Sales'] - trend['Returned Sales']
+    sales_fig, profit_fig, shipping_time_fig = [
+        plot_trend(trend, 'Order Date', y, title)
+        for y, title in [(['Sales', 'Net Sales'], 'Sales Trend'), ('Profit', 'Profit Trend'), ('Days to Ship', 'Shipping Time Trend')]
+    ]
+    return sales_fig, profit_fig, shipping_time_fig
 
 
 def table_page_layout():
+    meta = layout_metadata()
     return html.Div([
         html.H1("Table Page"),
         html.Div(id='message-div', style={'color': 'red'}),  # Adjust the style as needed
@@ -269,14 +618,14 @@ def table_page_layout():
             dbc.Row([
                 dbc.Col(dcc.Dropdown(
                     id='category-dropdown',
-                    options=[{'label': i, 'value': i} for i in orders_df['Category'].unique()],
+                    options=meta['options']['Category'],
                     value=None,
                     placeholder="Select a Category",
                     style={'width': '100%'}  # Add width style
                 ), width=6),
                 dbc.Col(dcc.Dropdown(
                     id='sub-category-dropdown',
-                    options=[{'label': i, 'value': i} for i in orders_df['Sub-Category'].unique()],
+                    options=meta['options']['Sub-Category'],
                     value=None,
                     placeholder="Select a Sub-Category",
                     style={'width': '100%'}  # Add width style
@@ -309,7 +658,7 @@ def table_page_layout():
                 dbc.Col(dcc.Input(id='days-to-ship', type='number', placeholder='Days to Ship'), width=6),
                 dbc.Col(dcc.Dropdown(
                     id='ship-mode',
-                    options=[{'label': i, 'value': i} for i in orders_df['Ship Mode'].unique()],
+                    options=meta['options']['Ship Mode'],
                     placeholder="Select Ship Mode",
                     style={'width': '100%'}  # Add width style
                 ), width=6),
@@ -317,13 +666,13 @@ def table_page_layout():
             dbc.Row([
                 dbc.Col(dcc.Dropdown(
                     id='customer-id',
-                    options=[{'label': i, 'value': i} for i in orders_df['Customer ID'].unique()],
+                    options=[],  # served by search_dropdown_options while typing
                     placeholder="Select Customer ID",
                     style={'width': '100%'}  # Add width style
                 ), width=6),
                 dbc.Col(dcc.Dropdown(
                     id='customer-name',
-                    options=[{'label': i, 'value': i} for i in orders_df['Customer Name'].unique()],
+                    options=[],  # served by search_dropdown_options while typing
                     placeholder="Select Customer Name",
                     style={'width': '100%'}  # Add width style
                 ), width=6),
@@ -331,13 +680,13 @@ def table_page_layout():
             dbc.Row([
                 dbc.Col(dcc.Dropdown(
                     id='segment',
-                    options=[{'label': i, 'value': i} for i in orders_df['Segment'].unique()],
+                    options=meta['options']['Segment'],
                     placeholder="Select Segment",
                     style={'width': '100%'}  # Add width style
                 ), width=6),
                 dbc.Col(dcc.Dropdown(
                     id='country',
-                    options=[{'label': i, 'value': i} for i in orders_df['Country'].unique()],
+                    options=meta['options']['Country'],
                     placeholder="Select Country",
                     style={'width': '100%'}  # Add width style
                 ), width=6),
@@ -345,13 +694,13 @@ def table_page_layout():
             dbc.Row([
                 dbc.Col(dcc.Dropdown(
                     id='city',
-                    options=[{'label': i, 'value': i} for i in orders_df['City'].unique()],
+                    options=[],  # served by search_dropdown_options while typing
                     placeholder="Select City",
                     style={'width': '100%'}  # Add width style
                 ), width=6),
                 dbc.Col(dcc.Dropdown(
                     id='state',
-                    options=[{'label': i, 'value': i} for i in orders_df['State'].unique()],
+                    options=meta['options']['State'],
                     placeholder="Select State",
                     style={'width': '100%'}  # Add width style
                 ), width=6),
@@ -360,7 +709,7 @@ def table_page_layout():
                 dbc.Col(dcc.Input(id='postal-code', type='number', placeholder='Postal Code'), width=6),
                 dbc.Col(dcc.Dropdown(
                     id='region',
-                    options=[{'label': i, 'value': i} for i in orders_df['Region'].unique()],
+                    options=meta['options']['Region'],
                    placeholder="Select Region",
                     style={'width': '100%'}  # Add width style
                 ), width=6),
@@ -368,13 +717,13 @@ def table_page_layout():
             dbc.Row([
                 dbc.Col(dcc.Dropdown(
                     id='product-id',
-                    options=[{'label': i, 'value': i} for i in orders_df['Product ID'].unique()],
+                    options=[],  # served by search_dropdown_options while typing
                     placeholder="Select Product ID",
                     style={'width': '100%'}  # Add width style
                 ), width=6),
                 dbc.Col(dcc.Dropdown(
                     id='category',
-                    options=[{'label': i, 'value': i} for i in orders_df['Category'].unique()],
+                    options=meta['options']['Category'],
                     placeholder="Select Category",
                     style={'width': '100%'}  # Add width style
                 ), width=6),
@@ -382,13 +731,13 @@ def table_page_layout():
             dbc.Row([
                 dbc.Col(dcc.Dropdown(
                     id='sub-category',
-                    options=[{'label': i, 'value': i} for i in orders_df['Sub-Category'].unique()],
+                    options=meta['options']['Sub-Category'],
                     placeholder="Select Sub-Category",
                     style={'width': '100%'}  # Add width style
                 ), width=6),
                 dbc.Col(dcc.Dropdown(
                     id='product-name',
-                    options=[{'label': i, 'value': i} for i in orders_df['Product Name'].unique()],
+                    options=[],  # served by search_dropdown_options while typing
                     placeholder="Select Product Name",
                     style={'width': '100%'}  # Add width style
                 ), width=6),
@@ -406,15 +755,43 @@ def table_page_layout():
             ], style={'margin-top': '10px'}),  # Add margin-top style
         ], style={'padding': '20px'}),
         
+        # Bulk Add: a CSV or workbook of orders, validated and added in one batch (see ingest_upload)
+        html.Div([
+            dcc.Upload(
+                id='orders-upload',
+                children=html.Div(['Drag and drop or ', html.A('select'), ' a CSV/xlsx file of orders']),
+                accept='.csv,.txt,.xlsx',
+                style={'borderWidth': '1px', 'borderStyle': 'dashed', 'borderRadius': '5px',
+                       'textAlign': 'center', 'padding': '10px'},
+            ),
+            html.Div(id='upload-report', style={'margin-top': '10px'}),
+        ], style={'padding': '0 20px 20px 20px'}),
+
+        # Export of the current view (see export_orders)
+        html.Div([
+            html.A("Export CSV", id='export-csv', href='/export/orders.csv', download='orders.csv'),
+            html.A("Export Parquet", id='export-parquet', href='/export/orders.parquet', download='orders.parquet',
+                   style={'margin-left': '20px'} if table_export.parquet_available() else {'display': 'none'}),
+        ], style={'padding': '0 20px 10px 20px'}),
+
         # DataTable
+        # Paging, sorting and filtering run on the server (see update_table_data),
+        # so only the requested page is ever sent to the browser
         dash_table.DataTable(
             id='orders-table',
-            columns=[{"name": i, "id": i} for i in orders_df.columns],
-            data=orders_df.to_dict('records'),
+            columns=[{"name": i, "id": i} for i in meta['columns']],
+            data=[],
+            page_current=0,
             page_size=10,
+            page_action='custom',
+            sort_action='custom',
+            sort_mode='multi',
+            sort_by=[],
+            filter_action='custom',
+            filter_query='',
             style_table={'height': '400px', 'overflowY': 'auto', 'margin': 'auto'},
             style_cell_conditional=[
-                {'if': {'column_id': c}, 'textAlign': 'left'} for c in orders_df.columns
+                {'if': {'column_id': c}, 'textAlign': 'left'} for c in meta['columns']
             ],
             style_header={
                 'backgroundColor': 'rgb(230, 230, 230)',
@@ -422,37 +799,130 @@ def table_page_layout():
             },
         ),
         
+        # Click count of the last Add Entry that passed the duplicate check (see show_popup)
+        dcc.Store(id='entry-accepted'),
+        # Number of uploads that added rows, to refresh the table after ingest_upload
+        dcc.Store(id='orders-uploaded', data=0),
+        # (Order ID, Row ID) keys of the rows the table is showing (see update_table_data)
+        dcc.Store(id='orders-table-keys', data=[]),
+
         # Modal for messages
         dbc.Modal([
             dbc.ModalBody("", id="modal-body"),
         ], id="modal", is_open=False),
     ], style={'padding': '20px'})
+# Export links for the table's current filters and sort order
+app.clientside_callback(
+    """
+    function(category, sub_category, filter_query, sort_by) {
+        var params = new URLSearchParams();
+        if (category) { params.append("category", category); }
+        if (sub_category) { params.append("sub_category", sub_category); }
+        if (filter_query) { params.append("filter_query", filter_query); }
+        (sort_by || []).forEach(function(col) {
+            params.append("sort", col.column_id + ":" + col.direction);
+        });
+        var query = params.toString() ? "?" + params.toString() : "";
+        return ["/export/orders.csv" + query, "/export/orders.parquet" + query];
+    }
+    """,
+    [Output('export-csv', 'href'), Output('export-parquet', 'href')],
+    [Input('category-dropdown', 'value'),
+     Input('sub-category-dropdown', 'value'),
+     Input('orders-table', 'filter_query'),
+     Input('orders-table', 'sort_by')],
+)
+
+# Duplicate check for Add Entry against the store's Order ID index. Accepted clicks are
+# passed on through `entry-accepted`, so the insert in update_table_data always runs after
+# this check and never races it.
 @app.callback(
     [Output('modal', 'is_open'),
-     Output('modal-body', 'children')],
+     Output('modal-body', 'children'),
+     Output('entry-accepted', 'data')],
     [Input('add-entry-button', 'n_clicks')],
-    [State('order-id', 'value'),
-     State('orders-table', 'data')],
+    [State('order-id', 'value')],
     prevent_initial_call=True
 )
-def show_popup(n_clicks, order_id, table_data):
+def show_popup(n_clicks, order_id):
     if n_clicks > 0:
-        orders_df = pd.DataFrame(table_data)  # Convert current table data to DataFrame
-        if order_id in orders_df['Order ID'].values:
-            return True, "Data already exists"
+        orders_backend.refresh()
+        if orders_backend.has_order(order_id):
+            return True, "Data already exists", dash.no_update
         else:
-            return True, "Data has been saved"
-    return False, ""
+            return True, "Data has been saved", n_clicks
+    return False, "", dash.no_update
+
+# Rejected rows shown under the upload; the summary line has the full count
+UPLOAD_REPORT_ROWS = 1000
+
 
 @app.callback(
-    Output('orders-table', 'data'),
+    [Output('upload-report', 'children'),
+     Output('orders-uploaded', 'data')],
+    [Input('orders-upload', 'contents')],
+    [State('orders-upload', 'filename'),
+     State('orders-uploaded', 'data')],
+    prevent_initial_call=True
+)
+def ingest_upload(contents, filename, uploaded_batches):
+    if not contents:
+        raise PreventUpdate
+    try:
+        raw = order_import.read_upload(contents, filename or '')
+    except Exception as exc:
+        return html.Div(f"Could not read {filename}: {exc}", style={'color': 'red'}), dash.no_update
+    added, rejected = order_import.ingest_orders(orders_backend, raw)
+    count_rows(len(raw))
+    report = [html.Div(f"{filename}: {added:,} rows added, {len(rejected):,} rejected")]
+    if len(rejected):
+        report.append(dash_table.DataTable(
+            columns=[{"name": i, "id": i} for i in rejected.columns],
+            data=rejected.head(UPLOAD_REPORT_ROWS).to_dict('records'),
+            page_size=10,
+            style_cell={'textAlign': 'left'},
+        ))
+    return report, ((uploaded_batches or 0) + 1 if added else dash.no_update)
+
+# Typeahead for the searchable dropdowns; the selected value is kept in the options so the
+# dropdown can still display it
+def register_dropdown_search(component_id, column):
+    @app.callback(
+        Output(component_id, 'options'),
+        [Input(component_id, 'search_value')],
+        [State(component_id, 'value')],
+    )
+    def search_dropdown_options(search_value, value):
+        if not search_value:
+            raise PreventUpdate
+        orders_backend.refresh()
+        matches = orders_backend.search(column, search_value)
+        if value is not None and value not in matches:
+            matches = [value] + matches
+        return [{'label': i, 'value': i} for i in matches]
+    return search_dropdown_options
+
+
+for dropdown_id, dropdown_column in SEARCHABLE_DROPDOWNS.items():
+    register_dropdown_search(dropdown_id, dropdown_column)
+
+
+@app.callback(
+    [Output('orders-table', 'data'),
+     Output('orders-table', 'page_count'),
+     Output('orders-table-keys', 'data')],
     [Input('category-dropdown', 'value'),
      Input('sub-category-dropdown', 'value'),
-     Input('add-entry-button', 'n_clicks')],
+     Input('entry-accepted', 'data'),
+     Input('orders-uploaded', 'data'),
+     Input('orders-table', 'page_current'),
+     Input('orders-table', 'page_size'),
+     Input('orders-table', 'sort_by'),
+     Input('orders-table', 'filter_query')],
     [State('row-id', 'value'),
      State('order-id', 'value'),
-     State('order-date', 'value'),
-     State('ship-date', 'value'),
+     State('order-date', 'date'),
+     State('ship-date', 'date'),
      State('days-to-ship', 'value'),
      State('ship-mode', 'value'),
      State('customer-id', 'value'),
@@ -470,23 +940,27 @@ def show_popup(n_clicks, order_id, table_data):
      State('sales', 'value'),
      State('quantity', 'value'),
      State('discount', 'value'),
-     State('profit', 'value')]
+     State('profit', 'value'),
+     State('orders-table-keys', 'data')]
 )
-def update_table_data(selected_category, selected_sub_category, n_clicks, row_id, order_id, order_date, ship_date, days_to_ship, ship_mode, customer_id,
+def update_table_data(selected_category, selected_sub_category, accepted_clicks, uploaded_batches, page_current, page_size, sort_by, filter_query,
+                      row_id, order_id, order_date, ship_date, days_to_ship, ship_mode, customer_id,
                       customer_name, segment, country, city, state, postal_code, region, product_id, category,
-                      sub_category, product_name, sales, quantity, discount, profit):
-    global orders_df  # Declare orders_df as global if you're modifying it
+                      sub_category, product_name, sales, quantity, discount, profit, shown_keys):
+    orders_backend.refresh()
     ctx = dash.callback_context
     button_id = ctx.triggered[0]['prop_id'].split('.')[0] if ctx.triggered else 'No clicks yet'
+    # An upload has already added its rows (see ingest_upload)
+    inserted = button_id == 'orders-uploaded'
 
-    if button_id == 'add-entry-button' and n_clicks > 0:
-        if order_id not in orders_df['Order ID'].values:
+    if button_id == 'entry-accepted' and accepted_clicks:
+        if not orders_backend.has_order(order_id):
             # Add new entry logic
             new_entry = {
                 'Row ID': row_id,
                 'Order ID': order_id,
-                'Order Date': pd.to_datetime(order_date),
-                'Ship Date': pd.to_datetime(ship_date),
+                'Order Date': order_date,
+                'Ship Date': ship_date,
                 'Days to Ship': days_to_ship,
                 'Ship Mode': ship_mode,
                 'Customer ID': customer_id,
@@ -506,23 +980,32 @@ def update_table_data(selected_category, selected_sub_category, n_clicks, row_id
                 'Discount': discount,
                 'Profit': profit
             }
-            new_entry_df = pd.DataFrame([new_entry])
-            orders_df = pd.concat([orders_df, new_entry_df], ignore_index=True)
-
-            # Save updated dataframe to Excel
-            orders_df.to_excel("orders.xlsx", sheet_name="Orders")
-
-    # Filter logic for existing data display
-    filtered_data = orders_df.copy()
-    if selected_category:
-        filtered_data = filtered_data[filtered_data['Category'] == selected_category]
-    if selected_sub_category:
-        filtered_data = filtered_data[filtered_data['Sub-Category'] == selected_sub_category]
-    return filtered_data.to_dict('records')
+            # Journal the entry; orders.xlsx is rewritten later by the background compactor
+            inserted = orders_backend.append_if_absent([new_entry]) is not None
+
+    # Filtering, sorting and paging happen in the backend; only the page comes back
+    filters = {'Category': selected_category, 'Sub-Category': selected_sub_category}
+    page, total_rows = orders_backend.table_page(filters, filter_query, sort_by, page_current, page_size)
+    count_rows(total_rows)
+    page_count = table_query.page_count(total_rows, page_size)
+    keys = table_query.row_keys(page)
+
+    # An insert leaves the rest of the view as it was: when the page the browser shows is
+    # unchanged, or only gained rows at its end, send nothing or just the appended rows
+    if inserted and shown_keys is not None and keys[:len(shown_keys)] == shown_keys:
+        added = keys[len(shown_keys):]
+        if not added:
+            return dash.no_update, page_count, dash.no_update
+        data, shown = dash.Patch(), dash.Patch()
+        data.extend(page.iloc[len(shown_keys):].to_dict('records'))
+        shown.extend(added)
+        return data, page_count, shown
+    return page.to_dict('records'), page_count, keys
 # Update your app.callback decorator to include an Output for the message display, like a Div's children
 
 # Graph Page Layout
 def graph_page_layout():
+    meta = layout_metadata()
     return html.Div([
     dbc.Container(
         [
@@ -537,10 +1020,10 @@ def graph_page_layout():
                     dbc.Col(
                         dcc.DatePickerRange(
                             id="graph-date-picker-range",
-                            min_date_allowed=orders_df["Order Date"].min(),
-                            max_date_allowed=orders_df["Order Date"].max(),
-                            start_date=orders_df["Order Date"].min(),
-                            end_date=orders_df["Order Date"].max(),
+                            min_date_allowed=meta['first_order'],
+                            max_date_allowed=meta['last_order'],
+                            start_date=meta['first_order'],
+                            end_date=meta['last_order'],
                         ),
                         width=12,
                     )
@@ -578,12 +1061,12 @@ def graph_page_layout():
                         [
                             dcc.Dropdown(
                                 id="x-axis-dropdown",
-                                options=[{"label": col, "value": col} for col in orders_df.columns if col not in ["Order Date", "Ship Date"]],
+                                options=[{"label": col, "value": col} for col in meta['columns'] if col not in ["Order Date", "Ship Date"]],
                                 value="Sales",
                             ),
                             dcc.Dropdown(
                                 id="y-axis-dropdown",
-                                options=[{"label": col, "value": col} for col in orders_df.columns if col not in ["Sales"]],
+                                options=[{"label": col, "value": col} for col in meta['columns'] if col not in ["Sales"]],
                                 value="Profit",
                             ),
                             dcc.Graph(id="bubble-chart")
@@ -598,7 +1081,7 @@ def graph_page_layout():
 ])
 
 
-@app.callback(
+@heavy_callback(
     Output("timeline-graph", "figure"),
     [
         Input("graph-date-picker-range", "start_date"),
@@ -606,13 +1089,15 @@ def graph_page_layout():
         Input("graph-time-axis-dropdown", "value"),
         Input("graph-granularity-dropdown", "value"),
     ],
+    running=[(Output("timeline-graph", "style"), {"opacity": 0.5}, {"opacity": 1})],
 )
+@figure_cache.memoize(orders_backend.refresh, lambda: orders_backend.source_id)
 def update_timeline(start_date, end_date, time_axis, granularity):
-    filtered_df = orders_df[(orders_df[time_axis] >= start_date) & (orders_df[time_axis] <= end_date)]
-    timeline_data = filtered_df.groupby(pd.Grouper(key=time_axis, freq=granularity))["Sales"].sum()  # Assuming Sales is the metric
+    timeline_data, rows = orders_backend.period_sums(time_axis, start_date, end_date, ["Sales"], granularity)  # Assuming Sales is the metric
+    count_rows(rows)
     fig = px.line(
-        x=timeline_data.index,
-        y=timeline_data.values,
+        x=timeline_data[time_axis],
+        y=timeline_data["Sales"],
         labels={"x": time_axis, "y": "Sales"},
         title="Sales Over Time",
     ).update_traces(
@@ -626,7 +1111,7 @@ def update_timeline(start_date, end_date, time_axis, granularity):
         title=dict(font=dict(size=20))
     )
     return fig
-@app.callback(
+@heavy_callback(
     Output("bubble-chart", "figure"),
     [
         Input("graph-date-picker-range", "start_date"),
@@ -634,24 +1119,51 @@ def update_timeline(start_date, end_date, time_axis, granularity):
         Input("x-axis-dropdown", "value"),
         Input("y-axis-dropdown", "value"),
     ],
+    running=[(Output("bubble-chart", "style"), {"opacity": 0.5}, {"opacity": 1})],
 )
+@figure_cache.memoize(orders_backend.refresh, lambda: orders_backend.source_id)
 def update_bubble_chart(start_date, end_date, x_axis, y_axis):
-    filtered_df = orders_df[(orders_df["Order Date"] >= start_date) & (orders_df["Order Date"] <= end_date)]
+    filtered_df = orders_backend.rows("Order Date", start_date, end_date, [x_axis, y_axis, "Quantity", "Category"])
+    count_rows(len(filtered_df))
+    # Large ranges are binned on the server (keeping per-Category outliers) and drawn with WebGL
+    plot_df, reduced = downsample.reduce_points(filtered_df, x_axis, y_axis, size="Quantity", color="Category")
+    title = f"{y_axis} vs {x_axis}"
+    if reduced:
+        title += f" ({len(plot_df):,} markers for {len(filtered_df):,} orders)"
     fig = px.scatter(
-        filtered_df,
+        plot_df,
         x=x_axis,
         y=y_axis,
         size="Quantity",  # Assuming Quantity represents the size of bubbles
         color="Category",  # Assuming Category represents the color of bubbles
-        title=f"{y_axis} vs {x_axis}",
+        title=title,
+        render_mode="webgl" if len(plot_df) > downsample.WEBGL_THRESHOLD else "auto",
     ).update_layout(
         plot_bgcolor="#F9F9F9",
         paper_bgcolor="#F9F9F9",
         font=dict(color="black"),
         margin=dict(t=40, r=20, b=30, l=40),
-        title=dict(font=dict(size=20))
+        title=dict(font=dict(size=20)),
+        meta={"points": len(filtered_df), "markers": len(plot_df), "reduced": reduced},
     )
     return fig
 
 if __name__ == '__main__':
-    app.run_server(debug=True)
+    # python Main.py                         run the dashboard
+    # python Main.py import FILE [FILE ...]  stream order rows from .xlsx/.csv files into the data
+    parser = argparse.ArgumentParser(description="Superstore dashboard")
+    commands = parser.add_subparsers(dest="command")
+    import_parser = commands.add_parser("import", help="append the orders of .xlsx/.csv files, skipping rows already present")
+    import_parser.add_argument("paths", nargs="+")
+    import_parser.add_argument("--sheet", help="worksheet to read (default: Orders, else the first one)")
+    import_parser.add_argument("--chunk-rows", type=int, default=order_import.CHUNK_ROWS)
+    args = parser.parse_args()
+    if args.command == "import":
+        for path in args.paths:
+            inserted, skipped = order_import.import_orders(orders_backend, path, args.sheet, args.chunk_rows, order_import.print_progress)
+            print(f"\n{path}: {inserted:,} rows added, {skipped:,} skipped", file=sys.stderr)
+        if not database_url:
+            # Fold the imported rows into the workbook and cache now instead of on the next compaction
+            orders_store.compact()
+    else:
+        app.run_server(debug=True)
@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+
+# Metrics kept in the cube (as sum + non-null count, so means can be rolled up exactly).
+# `Returned` is the 0/1 return flag joined onto orders (its mean is the return rate) and
+# `Returned Sales` the sales of returned lines (Sales minus it is net of returns).
+CUBE_METRICS = ['Sales', 'Profit', 'Days to Ship', 'Returned', 'Returned Sales']
+# Cube metrics that are not order columns but derived from them
+DERIVED_METRICS = {
+    'Returned Sales': lambda df: pd.to_numeric(df['Sales'], errors='coerce').where(df['Returned'].astype(bool), 0.0),
+}
+# Dimensions the cube is broken down by, below the day
+CUBE_DIMENSIONS = ['Region', 'Category', 'Segment']
+# Granularities understood by period_end (the dashboard uses D/M/Y, the graph page D/W/M/Q/Y)
+GRANULARITIES = ['D', 'W', 'M', 'Q', 'Y']
+
+
+def _value_columns(metrics):
+    columns = []
+    for metric in metrics:
+        columns += [f'{metric} sum', f'{metric} count']
+    return columns + ['Rows']
+
+
+# Daily sums/counts of every metric per (day, Region, Category, Segment), sorted by day.
+# Answering a query from the cube costs O(days in range), not O(orders).
+def build_daily_cube(df, date_col='Order Date', dims=CUBE_DIMENSIONS, metrics=CUBE_METRICS):
+    frame = pd.DataFrame({date_col: pd.to_datetime(df[date_col]).dt.normalize()}, index=df.index)
+    for dim in dims:
+        frame[dim] = df[dim]
+    for metric in metrics:
+        values = DERIVED_METRICS[metric](df) if metric in DERIVED_METRICS else pd.to_numeric(df[metric], errors='coerce')
+        frame[f'{metric} sum'] = values.fillna(0.0)
+        frame[f'{metric} count'] = values.notna().astype('int64')
+    frame['Rows'] = 1
+    frame = frame.dropna(subset=[date_col])
+    cube = frame.groupby([date_col] + list(dims), observed=True, dropna=False, sort=True).sum()
+    return cube.reset_index()
+
+
+# Fold freshly inserted orders into an existing cube
+def add_to_cube(cube, new_rows, date_col='Order Date', dims=CUBE_DIMENSIONS, metrics=CUBE_METRICS):
+    combined = pd.concat([cube, build_daily_cube(new_rows, date_col, dims, metrics)], ignore_index=True)
+    combined = combined.groupby([date_col] + list(dims), observed=True, dropna=False, sort=True).sum()
+    return combined.reset_index()
+
+
+# Rows of the cube between start and end (inclusive) matching the filters (a value, or a
+# list of accepted values). The cube is sorted by day, so the date range is a binary search
+# plus a slice.
+def slice_cube(cube, start_date, end_date, filters=None, date_col='Order Date'):
+    dates = cube[date_col].values
+    lo = dates.searchsorted(np.datetime64(pd.Timestamp(start_date)), side='left')
+    hi = dates.searchsorted(np.datetime64(pd.Timestamp(end_date)), side='right')
+    part = cube.iloc[lo:hi]
+    for column, value in (filters or {}).items():
+        if isinstance(value, (list, tuple, set)):
+            part = part[part[column].isin(list(value))]
+        elif value is not None:
+            part = part[part[column] == value]
+    return part
+
+
+def _ratio(numerator, denominator):
+    if denominator == 0:
+        return float('nan')
+    return numerator / denominator
+
+
+# Label of the period each date falls in, computed with datetime64 arithmetic only.
+# Labels are the last day of the period, the same ones resample/pd.Grouper use
+# (W ends on Sunday, Q/Y on the calendar quarter/year end). `dates` must not contain NaT.
+def period_end(dates, granularity):
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    if granularity == 'D':
+        end = dates.astype('datetime64[D]')
+    elif granularity == 'W':
+        days = dates.astype('datetime64[D]').astype('int64')
+        # 1970-01-01 was a Thursday, so (days + 3) % 7 is the weekday with Monday = 0
+        end = (days + 6 - (days + 3) % 7).astype('datetime64[D]')
+    elif granularity == 'M':
+        end = (dates.astype('datetime64[M]') + 1).astype('datetime64[D]') - 1
+    elif granularity == 'Q':
+        months = dates.astype('datetime64[M]').astype('int64')
+        end = (months - months % 3 + 3).astype('datetime64[M]').astype('datetime64[D]') - 1
+    elif granularity in ('Y', 'A'):
+        end = (dates.astype('datetime64[Y]') + 1).astype('datetime64[D]') - 1
+    else:
+        raise ValueError(f"Unsupported granularity {granularity!r}")
+    return end.astype('datetime64[ns]')
+
+
+# Every period label from the first to the last date, so empty periods show up as gaps/zeros
+def _all_periods(first, last, granularity):
+    days = np.arange(np.datetime64(first, 'D'), np.datetime64(last, 'D') + 1)
+    return pd.DatetimeIndex(np.unique(period_end(days, granularity)))
+
+
+# One pass trend engine: a single groupby over the period label for all metrics at once.
+# Only the metric arrays are touched (no copy of the frame, no dropna, no per-metric resample);
+# `how` is 'mean' (dashboard trends) or 'sum' (graph page timeline).
+def trend(df, date_col, metrics, granularity='M', how='mean'):
+    dates = df[date_col].to_numpy(dtype='datetime64[ns]')
+    valid = ~np.isnat(dates)
+    values = {}
+    for metric in metrics:
+        column = df[metric]
+        if not pd.api.types.is_numeric_dtype(column):
+            column = pd.to_numeric(column, errors='coerce')
+        values[metric] = column.to_numpy(dtype='float64', na_value=np.nan)[valid]
+    keys = period_end(dates[valid], granularity)
+    result = pd.DataFrame(values).groupby(keys, sort=True).agg(how)
+    if len(result):
+        result = result.reindex(_all_periods(result.index[0], result.index[-1], granularity), fill_value=0.0 if how == 'sum' else np.nan)
+    result.index.name = date_col
+    return result.reset_index()
+
+
+# Mean of every metric per period (same values the old per-row resample produced), from
+# the per-day sums and counts of a cube slice
+def rollup(cube_slice, granularity='M', date_col='Order Date', metrics=CUBE_METRICS):
+    daily = cube_slice.groupby(date_col, sort=True)[_value_columns(metrics)].sum()
+    sums = daily.groupby(period_end(daily.index, granularity), sort=True).sum()
+    if len(sums):
+        sums = sums.reindex(_all_periods(daily.index[0], daily.index[-1], granularity), fill_value=0)
+    result = pd.DataFrame(index=sums.index)
+    for metric in metrics:
+        result[metric] = sums[f'{metric} sum'] / sums[f'{metric} count'].where(sums[f'{metric} count'] > 0)
+    result.index.name = date_col
+    return result.reset_index()
+
+
+# Totals for the KPI cards
+def kpi_totals(cube_slice, metrics=CUBE_METRICS):
+    totals = cube_slice[_value_columns(metrics)].sum()
+    result = {'Rows': int(totals['Rows'])}
+    for metric in metrics:
+        result[f'{metric} sum'] = totals[f'{metric} sum']
+        result[f'{metric} mean'] = _ratio(totals[f'{metric} sum'], totals[f'{metric} count'])
+    return result
+
+
+# Running (prefix) sums of the cube's per-day values over a dense calendar, overall and per
+# value of `key_col`. The totals for any date range are the difference of two rows, so a KPI
+# and its comparison periods cost O(1) each, independent of orders and of days in range.
+class PrefixSums:
+    def __init__(self, cube, key_col='Region', date_col='Order Date', metrics=CUBE_METRICS):
+        self.metrics = list(metrics)
+        self.columns = _value_columns(metrics)
+        self.key_col = key_col
+        self._sums = {}
+        dates = cube[date_col].to_numpy(dtype='datetime64[D]')
+        if not len(dates):
+            self.first_day, self.days = None, 0
+            return
+        self.first_day = dates.min()
+        self.days = int((dates.max() - self.first_day).astype('int64')) + 1
+        day_positions = (dates - self.first_day).astype('int64')
+        values = cube[self.columns].to_numpy(dtype='float64')
+        groups = {None: np.arange(len(cube))}
+        groups.update(cube.groupby(key_col, observed=True, sort=False).indices)
+        for key, rows in groups.items():
+            dense = np.zeros((self.days + 1, len(self.columns)))
+            np.add.at(dense, day_positions[rows] + 1, values[rows])
+            self._sums[key] = dense.cumsum(axis=0)
+
+    def _day(self, value):
+        return int((np.datetime64(pd.Timestamp(value), 'D') - self.first_day).astype('int64'))
+
+    # The summed value columns (in `columns` order) for start <= day <= end and key_col == key
+    # (None = all, a list = the sum over those keys)
+    def sums(self, start_date, end_date, key=None):
+        vector = np.zeros(len(self.columns))
+        keys = list(key) if isinstance(key, (list, tuple, set)) else [key]
+        if self.days:
+            lo = min(max(self._day(start_date), 0), self.days)
+            hi = min(max(self._day(end_date) + 1, 0), self.days)
+            for key in keys:
+                sums = self._sums.get(key)
+                if sums is not None and hi > lo:
+                    vector = vector + (sums[hi] - sums[lo])
+        return vector
+
+    # Same shape as kpi_totals, for the rows `sums` selects
+    def totals(self, start_date, end_date, key=None):
+        return summed_totals([self], start_date, end_date, key)
+
+
+# PrefixSums.totals over several PrefixSums of the same metrics (parts of one dataset)
+def summed_totals(prefix_sums, start_date, end_date, key=None):
+    first = prefix_sums[0]
+    vector = sum(part.sums(start_date, end_date, key) for part in prefix_sums)
+    totals = dict(zip(first.columns, vector))
+    result = {'Rows': int(round(totals['Rows']))}
+    for metric in first.metrics:
+        result[f'{metric} sum'] = totals[f'{metric} sum']
+        result[f'{metric} mean'] = _ratio(totals[f'{metric} sum'], totals[f'{metric} count'])
+    return result
+
+
+# The equal-length period right before [start, end] and the same dates one year earlier
+def comparison_periods(start_date, end_date):
+    start, end = pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date).normalize()
+    length = end - start + pd.Timedelta(days=1)
+    year = pd.DateOffset(years=1)
+    return {
+        'previous': (start - length, start - pd.Timedelta(days=1)),
+        'year_ago': (start - year, end - year),
+    }
@@ -0,0 +1,440 @@
+import argparse
+import uuid
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+
+import aggregates
+import data_loader
+import option_index
+import table_query
+from orders_store import DERIVED_COLUMNS, concat_orders, enrich_orders, records_to_frame
+
+# Columns of the orders table, in the order the Table page shows them
+ORDER_COLUMNS = [
+    ('Row ID', sa.Float), ('Order ID', sa.String(32)), ('Order Date', sa.DateTime), ('Ship Date', sa.DateTime),
+    ('Days to Ship', sa.Float), ('Ship Mode', sa.String(32)), ('Customer ID', sa.String(32)),
+    ('Customer Name', sa.String(128)), ('Segment', sa.String(32)), ('Country', sa.String(64)), ('City', sa.String(64)),
+    ('State', sa.String(64)), ('Postal Code', sa.Float), ('Region', sa.String(32)), ('Product ID', sa.String(32)),
+    ('Category', sa.String(32)), ('Sub-Category', sa.String(32)), ('Product Name', sa.String(256)),
+    ('Sales', sa.Float), ('Quantity', sa.Float), ('Discount', sa.Float), ('Profit', sa.Float),
+    ('Returned', sa.Boolean), ('Regional Manager', sa.String(64)),
+]
+IMPORT_CHUNK_ROWS = 50_000
+# Rows per chunk of an export (iter_table_rows)
+EXPORT_CHUNK_ROWS = 20_000
+
+
+# The queries the callbacks make, answered from the in-memory OrdersStore: the date index,
+# the daily cube and its prefix sums of each of the store's parts (the canonical store and
+# the journal rows not compacted yet), merged per query. Every method has a SqlBackend twin
+# with the same result.
+class PandasBackend:
+    def __init__(self, store):
+        self.store = store
+
+    # Dataset version after catching up with other workers' inserts
+    def refresh(self):
+        return self.store.refresh()
+
+    # What the versions count from: the workbook and journal behind the store
+    @property
+    def source_id(self):
+        return self.store.source_id
+
+    def columns(self):
+        return list(self.store.parts[0].frame.columns)
+
+    def bounds(self, date_col):
+        found = [part.index.bounds(date_col) for part in self.store.parts]
+        firsts = [first for first, _ in found if first is not None]
+        if not firsts:
+            return None, None
+        return min(firsts), max(last for _, last in found if last is not None)
+
+    def distinct(self, column):
+        return list(dict.fromkeys(value for part in self.store.parts for value in part.frame[column].dropna().unique()))
+
+    def search(self, column, prefix, limit=50):
+        return option_index.search_all([part.options[column] for part in self.store.parts], prefix, limit)
+
+    def has_order(self, order_id):
+        return self.store.has_order(order_id)
+
+    def append_if_absent(self, records):
+        return self.store.append_if_absent(records)
+
+    # (Order ID, Row ID) of every row, for de-duplicating imports
+    def order_keys(self):
+        keys = set()
+        for part in self.store.parts:
+            keys.update(zip(part.frame['Order ID'].astype(str), part.frame['Row ID'].astype('float64')))
+        return keys
+
+    # The given Order IDs that are already in the data
+    def known_order_ids(self, order_ids):
+        return {order_id for order_id in order_ids if self.store.has_order(order_id)}
+
+    # Append prepared order rows (an import chunk) through the journal
+    def append_rows(self, frame):
+        return self.store.append(_records(frame))
+
+    # append_rows, unless one of the rows' Order IDs exists already (checked in the journal's write
+    # transaction, so no two workers insert the same Order ID)
+    def append_rows_if_absent(self, frame):
+        return self.store.append_if_absent(_records(frame))
+
+    # KPI totals for start <= Order Date <= end, one region, a list of regions or all
+    def totals(self, start_date, end_date, regions=None):
+        return aggregates.summed_totals([part.prefix_sums for part in self.store.parts], start_date, end_date, regions)
+
+    # Per-day sums/counts of the cube metrics (the input of aggregates.rollup/kpi_totals)
+    def daily_cube(self, start_date, end_date, filters=None):
+        slices = [aggregates.slice_cube(part.cube, start_date, end_date, filters) for part in self.store.parts]
+        slices = [part for part in slices if len(part)] or slices[:1]
+        if len(slices) == 1:
+            return slices[0]
+        return pd.concat(slices, ignore_index=True).sort_values('Order Date', kind='stable')
+
+    # Sum of `metrics` per period of `date_col`
+    def period_sums(self, date_col, start_date, end_date, metrics, granularity):
+        rows = self.store.query(date_col, start_date, end_date, list(dict.fromkeys([date_col, *metrics])))
+        return aggregates.trend(rows, date_col, metrics, granularity, how="sum"), len(rows)
+
+    # The given columns of every order in the date range
+    def rows(self, date_col, start_date, end_date, columns):
+        return self.store.query(date_col, start_date, end_date, list(dict.fromkeys(columns)))
+
+    # One page of the Table page: equality filters, the DataTable filter_query and sort_by.
+    # Returns the page and the number of matching rows.
+    def table_page(self, filters, filter_query, sort_by, page_current, page_size):
+        parts = self.store.parts
+        owners, positions = _table_rows(parts, filters, filter_query, sort_by)
+        start, stop = table_query.page_bounds(len(positions), page_current, page_size)
+        return _take_rows(parts, owners[start:stop], positions[start:stop]), len(positions)
+
+    # table_page's whole result (not paged) in chunks, for exports. Only the row positions
+    # of the result are held; each chunk is taken from the store's snapshot when it is asked for.
+    def iter_table_rows(self, filters, filter_query, sort_by, chunk_rows=EXPORT_CHUNK_ROWS):
+        parts = self.store.parts
+        owners, positions = _table_rows(parts, filters, filter_query, sort_by)
+        for start in range(0, len(positions), chunk_rows):
+            yield _take_rows(parts, owners[start:start + chunk_rows], positions[start:start + chunk_rows])
+
+
+# The Table page view over the store's parts as (part number, row position) pairs in table
+# order: the equality filters, the DataTable filter_query and sort_by. Only the sort columns
+# of the matching rows are copied.
+def _table_rows(parts, filters, filter_query, sort_by):
+    owners, positions = [], []
+    for number, part in enumerate(parts):
+        frame = part.frame
+        mask = table_query.filter_mask(frame, filter_query)
+        for column, value in filters.items():
+            if value:
+                mask &= frame[column] == value
+        selected = np.flatnonzero(mask.to_numpy())
+        owners.append(np.full(len(selected), number))
+        positions.append(selected)
+    sort_by = [col for col in sort_by or [] if col['column_id'] in parts[0].frame.columns]
+    owners, positions = np.concatenate(owners), np.concatenate(positions)
+    if sort_by:
+        columns = list(dict.fromkeys(col['column_id'] for col in sort_by))
+        keys = parts[0].frame[columns].iloc[positions[owners == 0]]
+        for number, part in enumerate(parts[1:], 1):
+            keys = concat_orders(keys, part.frame[columns].iloc[positions[owners == number]])
+        order = table_query.apply_sort(keys.reset_index(drop=True), sort_by).index.to_numpy()
+        owners, positions = owners[order], positions[order]
+    return owners, positions
+
+
+# The rows at those (part number, row position) pairs, in that order
+def _take_rows(parts, owners, positions):
+    numbers = [number for number in range(len(parts)) if (owners == number).any()] or [0]
+    if len(numbers) == 1:
+        return parts[numbers[0]].frame.iloc[positions]
+    at = [np.flatnonzero(owners == number) for number in numbers]
+    rows = parts[numbers[0]].frame.iloc[positions[at[0]]]
+    for number, chosen in zip(numbers[1:], at[1:]):
+        rows = concat_orders(rows, parts[number].frame.iloc[positions[chosen]])
+    return rows.iloc[np.argsort(np.concatenate(at))]
+
+
+# The same queries against a SQL database through SQLAlchemy (tested on SQLite; DuckDB
+# works through the duckdb-engine dialect). Date ranges, region/category predicates and
+# the filter row become WHERE clauses, metrics are summed per day by GROUP BY in the engine
+# (the periods are then rolled up from at most one row per day), and the table is paged
+# with ORDER BY/LIMIT/OFFSET, so a worker only ever holds one page or one day-level result.
+class SqlBackend:
+    def __init__(self, url, returned_order_ids=(), region_managers=None, table_name="orders"):
+        self.engine = sa.create_engine(url)
+        if self.engine.dialect.name == "sqlite":
+            # SQLite's LIKE ignores case by default; `contains` in the filter row must not
+            sa.event.listen(self.engine, "connect", lambda conn, _: conn.execute("PRAGMA case_sensitive_like = ON"))
+        self.returned_order_ids = frozenset(returned_order_ids)
+        self.region_managers = dict(region_managers or {})
+        self.metadata = sa.MetaData()
+        self.table = sa.Table(table_name, self.metadata, *(sa.Column(name, type_) for name, type_ in ORDER_COLUMNS))
+        self.version_table = sa.Table(
+            f"{table_name}_version", self.metadata,
+            sa.Column('id', sa.Integer, primary_key=True), sa.Column('version', sa.Integer, nullable=False),
+            sa.Column('generation', sa.String(32)),
+        )
+        # URL and generation of the data, set by refresh()
+        self.source_id = None
+        for name, columns in [('order_date', ['Order Date']), ('ship_date', ['Ship Date']),
+                              ('region_order_date', ['Region', 'Order Date']), ('order_id', ['Order ID'])]:
+            sa.Index(f"ix_{table_name}_{name}", *(self.table.c[col] for col in columns))
+
+    # (Re)create the tables and load a prepared orders frame in chunks
+    def import_frame(self, frame, chunk_rows=IMPORT_CHUNK_ROWS):
+        self.metadata.drop_all(self.engine)
+        self.metadata.create_all(self.engine)
+        with self.engine.begin() as conn:
+            # Versions restart at 0 on every import; the generation tells the imports apart
+            conn.execute(self.version_table.insert().values(id=1, version=0, generation=uuid.uuid4().hex))
+        for start in range(0, len(frame), chunk_rows):
+            self._insert(frame.iloc[start: start + chunk_rows])
+
+    def _insert(self, frame, conn=None):
+        rows = frame[[name for name, _ in ORDER_COLUMNS]].astype(object)
+        rows = rows.where(rows.notna(), None).to_dict('records')
+        with (self.engine.begin() if conn is None else nullcontext(conn)) as conn:
+            if rows:
+                conn.execute(self.table.insert(), rows)
+            conn.execute(self.version_table.update().values(version=self.version_table.c.version + 1))
+
+    def refresh(self):
+        with self.engine.connect() as conn:
+            version, generation = conn.execute(sa.select(self.version_table.c.version, self.version_table.c.generation)).one()
+        self.source_id = f"{self.engine.url.render_as_string(hide_password=True)}:{generation}"
+        return version or 0
+
+    def columns(self):
+        return [name for name, _ in ORDER_COLUMNS]
+
+    def bounds(self, date_col):
+        column = self.table.c[date_col]
+        with self.engine.connect() as conn:
+            first, last = conn.execute(sa.select(sa.func.min(column), sa.func.max(column))).one()
+        if first is None:
+            return None, None
+        return pd.Timestamp(first), pd.Timestamp(last)
+
+    def distinct(self, column):
+        column = self.table.c[column]
+        with self.engine.connect() as conn:
+            return list(conn.execute(sa.select(column).where(column.isnot(None)).distinct().order_by(column)).scalars())
+
+    def search(self, column, prefix, limit=50):
+        column = self.table.c[column]
+        query = (sa.select(column).distinct()
+                 .where(sa.func.lower(column).startswith((prefix or '').lower(), autoescape=True))
+                 .order_by(column).limit(limit))
+        with self.engine.connect() as conn:
+            return list(conn.execute(query).scalars())
+
+    def has_order(self, order_id, conn=None):
+        query = sa.select(self.table.c['Order ID']).where(self.table.c['Order ID'] == order_id).limit(1)
+        if conn is not None:
+            return conn.execute(query).first() is not None
+        with self.engine.connect() as conn:
+            return conn.execute(query).first() is not None
+
+    # Insert the records (and bump the version) unless one of their Order IDs exists already
+    def append_if_absent(self, records):
+        records = list(records)
+        like = pd.DataFrame({name: pd.Series(dtype=_dtype(type_)) for name, type_ in ORDER_COLUMNS}).drop(columns=DERIVED_COLUMNS)
+        rows = enrich_orders(records_to_frame(records, like), self.returned_order_ids, self.region_managers)
+        with self.engine.begin() as conn:
+            if any(self.has_order(record.get('Order ID'), conn) for record in records):
+                return None
+            self._insert(rows, conn)
+            return conn.execute(sa.select(self.version_table.c.version)).scalar()
+
+    def order_keys(self):
+        query = sa.select(self.table.c['Order ID'], self.table.c['Row ID'])
+        with self.engine.connect() as conn:
+            return {(str(order_id), row_id) for order_id, row_id in conn.execute(query)}
+
+    def known_order_ids(self, order_ids, conn=None):
+        order_ids = list(order_ids)
+        column = self.table.c['Order ID']
+        known = set()
+        with (self.engine.connect() if conn is None else nullcontext(conn)) as conn:
+            # Bounded IN lists: SQLite allows 999 parameters per statement
+            for start in range(0, len(order_ids), 500):
+                query = sa.select(column).distinct().where(column.in_(order_ids[start:start + 500]))
+                known.update(conn.execute(query).scalars())
+        return known
+
+    def append_rows(self, frame):
+        self._insert(enrich_orders(frame, self.returned_order_ids, self.region_managers))
+
+    def append_rows_if_absent(self, frame):
+        rows = enrich_orders(frame, self.returned_order_ids, self.region_managers)
+        with self.engine.begin() as conn:
+            if self.known_order_ids(frame['Order ID'].dropna().unique(), conn):
+                return None
+            self._insert(rows, conn)
+            return conn.execute(sa.select(self.version_table.c.version)).scalar()
+
+    def _where(self, query, date_col, start_date, end_date, filters=None):
+        column = self.table.c[date_col]
+        query = query.where(column >= pd.Timestamp(start_date).to_pydatetime(), column <= pd.Timestamp(end_date).to_pydatetime())
+        for name, value in (filters or {}).items():
+            if isinstance(value, (list, tuple, set)):
+                query = query.where(self.table.c[name].in_(list(value)))
+            elif value is not None:
+                query = query.where(self.table.c[name] == value)
+        return query
+
+    # SUM/COUNT pairs named like the cube's value columns
+    def _metric_columns(self):
+        t = self.table
+        values = {
+            'Sales': t.c['Sales'],
+            'Profit': t.c['Profit'],
+            'Days to Ship': t.c['Days to Ship'],
+            'Returned': sa.cast(t.c['Returned'], sa.Float),
+            'Returned Sales': sa.case((t.c['Returned'], t.c['Sales']), else_=0.0),
+        }
+        columns = []
+        for metric in aggregates.CUBE_METRICS:
+            columns += [sa.func.coalesce(sa.func.sum(values[metric]), 0.0).label(f'{metric} sum'),
+                        sa.func.count(values[metric]).label(f'{metric} count')]
+        return columns + [sa.func.count().label('Rows')]
+
+    def _read(self, query, date_columns=()):
+        with self.engine.connect() as conn:
+            frame = pd.read_sql(query, conn)
+        for column in date_columns:
+            frame[column] = pd.to_datetime(frame[column])
+        return frame
+
+    def totals(self, start_date, end_date, regions=None):
+        query = self._where(sa.select(*self._metric_columns()), 'Order Date', start_date, end_date, {'Region': regions})
+        return aggregates.kpi_totals(self._read(query))
+
+    def daily_cube(self, start_date, end_date, filters=None):
+        day = self.table.c['Order Date']
+        query = self._where(sa.select(day, *self._metric_columns()), 'Order Date', start_date, end_date, filters)
+        return self._read(query.group_by(day).order_by(day), ['Order Date'])
+
+    def period_sums(self, date_col, start_date, end_date, metrics, granularity):
+        day = self.table.c[date_col]
+        sums = [sa.func.coalesce(sa.func.sum(self.table.c[metric]), 0.0).label(metric) for metric in metrics]
+        query = self._where(sa.select(day, *sums, sa.func.count().label('Rows')), date_col, start_date, end_date)
+        daily = self._read(query.group_by(day).order_by(day), [date_col])
+        return aggregates.trend(daily, date_col, metrics, granularity, how="sum"), int(daily['Rows'].sum())
+
+    def rows(self, date_col, start_date, end_date, columns):
+        columns = list(dict.fromkeys(columns))
+        query = self._where(sa.select(*(self.table.c[col] for col in columns)), date_col, start_date, end_date)
+        return self._read(query, [col for col in columns if col in ('Order Date', 'Ship Date')])
+
+    # WHERE conditions and ORDER BY of the Table page view
+    def _table_view(self, filters, filter_query, sort_by):
+        t = self.table
+        conditions = [t.c[column] == value for column, value in filters.items() if value]
+        conditions += filter_conditions(t, filter_query)
+        order_by = []
+        for col in sort_by or []:
+            if col['column_id'] in t.c:
+                column = t.c[col['column_id']]
+                # NULLs last in both directions, like DataFrame.sort_values(na_position='last')
+                order_by += [column.is_(None), column.asc() if col['direction'] == 'asc' else column.desc()]
+        order_by += [t.c['Order Date'].is_(None), t.c['Order Date'], t.c['Row ID']]
+        return conditions, order_by
+
+    def table_page(self, filters, filter_query, sort_by, page_current, page_size):
+        t = self.table
+        conditions, order_by = self._table_view(filters, filter_query, sort_by)
+        with self.engine.connect() as conn:
+            total = conn.execute(sa.select(sa.func.count()).select_from(t).where(*conditions)).scalar()
+        page_current = min(page_current or 0, table_query.page_count(total, page_size) - 1)
+        query = sa.select(t).where(*conditions).order_by(*order_by).limit(page_size).offset(page_current * page_size)
+        return self._read(query, ['Order Date', 'Ship Date']), total
+
+    # Server-side cursor: the engine sends the rows as the chunks are read
+    def iter_table_rows(self, filters, filter_query, sort_by, chunk_rows=EXPORT_CHUNK_ROWS):
+        conditions, order_by = self._table_view(filters, filter_query, sort_by)
+        query = sa.select(self.table).where(*conditions).order_by(*order_by)
+        with self.engine.connect().execution_options(stream_results=True) as conn:
+            for chunk in pd.read_sql(query, conn, chunksize=chunk_rows):
+                for column in ('Order Date', 'Ship Date'):
+                    chunk[column] = pd.to_datetime(chunk[column])
+                yield chunk
+
+
+# Rows as journal records: plain Python values, None for missing cells
+def _records(frame):
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+
+def _dtype(type_):
+    if type_ is sa.DateTime:
+        return 'datetime64[ns]'
+    if type_ is sa.Float:
+        return 'float64'
+    if type_ is sa.Boolean:
+        return 'bool'
+    return 'object'
+
+
+# Kind of value a column holds, for table_query.range_operand
+def _kind(type_):
+    if isinstance(type_, sa.DateTime):
+        return 'datetime'
+    if isinstance(type_, (sa.Float, sa.Integer, sa.Boolean)):
+        return 'number'
+    return 'text'
+
+
+# The DataTable filter_query as SQL conditions (same operators as table_query.filter_mask)
+def filter_conditions(table, filter_query):
+    conditions = []
+    if not filter_query:
+        return conditions
+    for filter_part in filter_query.split(' && '):
+        col_name, operator, filter_value = table_query.split_filter_part(filter_part)
+        if col_name not in table.c:
+            continue
+        column = table.c[col_name]
+        if operator == 'eq':
+            conditions.append(column == filter_value)
+        elif operator == 'ne':
+            conditions.append(sa.or_(column != filter_value, column.is_(None)))
+        elif operator in ('lt', 'le', 'gt', 'ge'):
+            operand = table_query.range_operand(filter_value, _kind(column.type))
+            conditions.append(sa.false() if operand is None else getattr(column, f'__{operator}__')(operand))
+        elif operator == 'contains':
+            conditions.append(sa.cast(column, sa.String).contains(str(filter_value), autoescape=True))
+        elif operator == 'datestartswith':
+            conditions.append(sa.cast(column, sa.String).startswith(str(filter_value), autoescape=True))
+    return conditions
+
+
+# Load the workbooks into a SQL database for DASHBOARD_DATABASE_URL:
+#   python backends.py sqlite:///orders.db
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load the orders workbooks into a SQL database.")
+    parser.add_argument("url", help="SQLAlchemy URL, e.g. sqlite:///orders.db or duckdb:///orders.duckdb")
+    parser.add_argument("--orders", default="orders.xlsx")
+    parser.add_argument("--returns", default="Returns.xlsx")
+    parser.add_argument("--people", default="Peoples.xlsx")
+    args = parser.parse_args(argv)
+
+    returns = data_loader.load_returns(args.returns)
+    people = data_loader.load_people(args.people)
+    returned_order_ids = returns.loc[returns['Returned'] == 'Yes', 'Order ID']
+    region_managers = dict(zip(people['Region'].astype(str), people['Person'].astype(str)))
+    orders = enrich_orders(data_loader.load_orders(args.orders), returned_order_ids, region_managers)
+    SqlBackend(args.url, returned_order_ids, region_managers).import_frame(orders)
+    print(f"loaded {len(orders):,} orders into {args.url}")
+
+
+if __name__ == "__main__":
+    main()
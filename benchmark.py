@@ -0,0 +1,337 @@
+import argparse
+import importlib
+import itertools
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# Benchmark harness for the dashboard callbacks.
+# Every size runs in its own process: synthetic Superstore-shaped workbooks are written to a
+# temporary directory (a tiny placeholder .xlsx plus the full prepared frame in the columnar
+# cache, so no multi-million-row Excel file is ever written or parsed), Main is imported
+# there without starting the server, and the callback functions are called directly with
+# sweeps of realistic inputs. Results are written as JSON; `--compare` prints the p50
+# ratio of every callback against an earlier result file.
+#
+#   python benchmark.py --sizes 10k,100k --output bench.json
+#   python benchmark.py --sizes 10k,100k --compare bench.json
+
+DEFAULT_SIZES = "10k,100k,1M,10M"
+REGIONS = {"West": "Anna Andreadi", "East": "Chuck Magee", "Central": "Kelly Williams", "South": "Cassandra Brandow"}
+STATES = {
+    "West": [("California", "Los Angeles", 90049), ("Washington", "Seattle", 98103), ("Arizona", "Phoenix", 85023)],
+    "East": [("New York", "New York City", 10035), ("Pennsylvania", "Philadelphia", 19140), ("Ohio", "Columbus", 43229)],
+    "Central": [("Texas", "Houston", 77095), ("Illinois", "Chicago", 60653), ("Michigan", "Detroit", 48205)],
+    "South": [("Florida", "Miami", 33142), ("Georgia", "Atlanta", 30318), ("Virginia", "Richmond", 23223)],
+}
+SUB_CATEGORIES = {
+    "Furniture": ["Bookcases", "Chairs", "Furnishings", "Tables"],
+    "Office Supplies": ["Appliances", "Art", "Binders", "Envelopes", "Fasteners", "Labels", "Paper", "Storage", "Supplies"],
+    "Technology": ["Accessories", "Copiers", "Machines", "Phones"],
+}
+SHIP_MODES = ["Standard Class", "Second Class", "First Class", "Same Day"]
+SEGMENTS = ["Consumer", "Corporate", "Home Office"]
+DISCOUNTS = [0.0, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8]
+FIRST_DAY, DAYS = np.datetime64("2014-01-03"), 4 * 365
+
+
+def parse_size(text):
+    text = text.strip().upper()
+    scale = {"K": 1_000, "M": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("KM")) * scale)
+
+
+def _categorical(rng, values, n, p=None):
+    return pd.Categorical.from_codes(rng.choice(len(values), size=n, p=p), categories=values)
+
+
+# Orders shaped like the Superstore sheet: ~2 lines per order, 4 years of dates, lognormal
+# sales, pools of customers/products that grow with the row count
+def synthetic_orders(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    orders = max(rows // 2, 1)
+    order_no = np.sort(rng.integers(0, orders, size=rows))
+    order_day = np.sort(rng.integers(0, DAYS, size=orders))[order_no]
+    order_date = FIRST_DAY + order_day.astype("timedelta64[D]")
+    ship_date = order_date + rng.choice(8, size=rows, p=[.05, .04, .13, .1, .28, .22, .12, .06]).astype("timedelta64[D]")
+    years = order_date.astype("datetime64[Y]").astype(int) + 1970
+
+    customers = max(800, rows // 12)
+    customer_no = rng.integers(0, customers, size=orders)[order_no]
+    customer_ids = pd.Categorical.from_codes(customer_no, categories=[f"CU-{i:06d}" for i in range(customers)])
+    customer_names = pd.Categorical.from_codes(customer_no, categories=[f"Customer {i:06d}" for i in range(customers)])
+
+    regions = list(REGIONS)
+    region_no = rng.integers(0, len(regions), size=orders)[order_no]
+    place_no = rng.integers(0, 3, size=rows)
+    places = [place for region in regions for place in STATES[region]]
+    place_codes = region_no * 3 + place_no
+
+    categories = list(SUB_CATEGORIES)
+    sub_categories = [(category, sub) for category in categories for sub in SUB_CATEGORIES[category]]
+    sub_no = rng.integers(0, len(sub_categories), size=rows)
+    products = max(1862, rows // 5)
+    product_no = rng.integers(0, products, size=rows)
+
+    sales = np.round(rng.lognormal(4.0, 1.4, size=rows), 4)
+    discount = rng.choice(DISCOUNTS, size=rows, p=[.48, .04, .01, .37, .02, .02, .01, .01, .02, .02])
+    profit = np.round(sales * (rng.normal(0.15, 0.2, size=rows) - discount * 0.8), 4)
+
+    frame = pd.DataFrame({
+        "Row ID": np.arange(1, rows + 1),
+        "Order ID": pd.Series([f"CA-{y}-{n:07d}" for y, n in zip(years.tolist(), order_no.tolist())], dtype=object),
+        "Order Date": order_date,
+        "Ship Date": ship_date,
+        "Ship Mode": _categorical(rng, SHIP_MODES, orders, p=[.6, .19, .16, .05])[order_no],
+        "Customer ID": customer_ids,
+        "Customer Name": customer_names,
+        "Segment": pd.Categorical.from_codes(customer_no % len(SEGMENTS), categories=SEGMENTS),
+        "Country": pd.Categorical(["United States"] * rows),
+        "City": pd.Categorical.from_codes(place_codes, categories=[city for _, city, _ in places]),
+        "State": pd.Categorical.from_codes(place_codes, categories=[state for state, _, _ in places]),
+        "Postal Code": np.array([code for _, _, code in places], dtype="float64")[place_codes],
+        "Region": pd.Categorical.from_codes(region_no, categories=regions),
+        "Product ID": pd.Series([f"PR-{n:08d}" for n in product_no.tolist()], dtype=object),
+        "Category": pd.Categorical.from_codes(np.array([categories.index(c) for c, _ in sub_categories])[sub_no], categories=categories),
+        "Sub-Category": pd.Categorical.from_codes(sub_no, categories=[sub for _, sub in sub_categories]),
+        "Product Name": pd.Series([f"Product {n:08d}" for n in product_no.tolist()], dtype=object),
+        "Sales": sales,
+        "Quantity": rng.integers(1, 15, size=rows).astype("float64"),
+        "Discount": discount,
+        "Profit": profit,
+    })
+    returned = pd.unique(frame["Order ID"].to_numpy()[rng.random(rows) < 0.04])
+    returns = pd.DataFrame({"Returned": "Yes", "Order ID": returned})
+    people = pd.DataFrame({"Person": list(REGIONS.values()), "Region": regions})
+    return frame, returns, people
+
+
+# A small real workbook (the first rows) plus the full prepared frame stored in its cache;
+# data_loader finds the cache keyed on the placeholder and never parses the workbook
+def write_sheet(path, sheet_name, frame, prepare):
+    frame.head(5).to_excel(path, sheet_name=sheet_name, index=False)
+    data_loader = importlib.import_module("data_loader")
+    data_loader.save_sheet_cache(path, sheet_name, prepare(frame))
+
+
+# name -> list of argument tuples
+def input_sweeps(main):
+    first, last = (str(value.date()) for value in main.orders_backend.bounds("Order Date"))
+    last_ts = pd.Timestamp(last)
+    ranges = [
+        (first, last),
+        (str((last_ts - pd.DateOffset(years=1)).date()), last),
+        (str((last_ts - pd.DateOffset(months=3)).date()), last),
+    ]
+    no_entry = (None,) * 22
+    sweeps = {
+        "update_kpis": [
+            (start, end, region, manager)
+            for (start, end), (region, manager) in itertools.product(ranges, [(None, None), ("West", None), (None, "Chuck Magee")])
+        ],
+        "update_trend_graphs": [
+            (start, end, region, granularity, None)
+            for (start, end), region, granularity in itertools.product(ranges, [None, "West"], ["D", "M", "Y"])
+        ],
+        "update_table_data": [
+            (category, None, None, None, page, 10, sort_by, filter_query) + no_entry + ([],)
+            for category, page, sort_by, filter_query in itertools.product(
+                [None, "Furniture"], [0, 50],
+                [[], [{"column_id": "Sales", "direction": "desc"}]],
+                ["", "{Region} = West", "{Sales} > 500 && {Customer Name} contains 00"],
+            )
+        ],
+        "update_timeline": [
+            (start, end, axis, granularity)
+            for (start, end), axis, granularity in itertools.product(ranges[:2], ["Order Date", "Ship Date"], ["D", "W", "M", "Q", "Y"])
+        ],
+        "update_bubble_chart": [
+            (start, end, x, y)
+            for (start, end), (x, y) in itertools.product(ranges, [("Sales", "Profit"), ("Discount", "Profit"), ("Region", "Sales")])
+        ],
+        "display_page": [("/",), ("/Table",), ("/graph",)],
+    }
+    return sweeps
+
+
+def _clear_caches(main):
+    main.figure_cache.clear()
+    main.layout_cache.clear()
+
+
+def run_callback(main, name, args, repeat):
+    from dash._callback_context import context_value
+    from dash._utils import AttributeDict
+    from plotly.io.json import to_json_plotly
+
+    func = getattr(main, name)
+    # update_table_data reads dash.callback_context.triggered
+    context_value.set(AttributeDict(triggered_inputs=[], inputs_list=[], states_list=[]))
+    timings = []
+    for _ in range(repeat):
+        _clear_caches(main)
+        started = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - started)
+    payload = len(to_json_plotly(result).encode("utf-8"))
+    _clear_caches(main)
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return timings, payload, peak
+
+
+def summarize(timings, payloads, peaks):
+    ms = np.array(timings) * 1000.0
+    return {
+        "calls": len(ms),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+        "payload_bytes_mean": int(np.mean(payloads)),
+        "payload_bytes_max": int(max(payloads)),
+        "peak_memory_mb": round(max(peaks) / 2**20, 2),
+    }
+
+
+# One size, in this process: build the data, import Main in the data directory, run sweeps
+def run_size(rows, repeat, seed, callbacks=None, sql=False):
+    workdir = tempfile.mkdtemp(prefix=f"dash-bench-{rows}-")
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, here)
+    try:
+        started = time.perf_counter()
+        orders, returns, people = synthetic_orders(rows, seed)
+        generate_seconds = time.perf_counter() - started
+        data_loader = importlib.import_module("data_loader")
+        os.chdir(workdir)
+        write_sheet("orders.xlsx", "Orders", orders, data_loader.prepare_orders)
+        write_sheet("Returns.xlsx", "Returns", returns, data_loader.prepare_returns)
+        write_sheet("Peoples.xlsx", "People", people, data_loader.prepare_people)
+        if sql:
+            backends = importlib.import_module("backends")
+            orders_store = importlib.import_module("orders_store")
+            returned = returns["Order ID"]
+            orders = orders_store.enrich_orders(data_loader.prepare_orders(orders), returned, REGIONS)
+            backends.SqlBackend("sqlite:///orders.db", returned, REGIONS).import_frame(orders)
+            os.environ["DASHBOARD_DATABASE_URL"] = "sqlite:///orders.db"
+        del orders, returns, people
+
+        # Callbacks run in this process, not as background jobs
+        os.environ["DASHBOARD_BACKGROUND"] = "0"
+        started = time.perf_counter()
+        main = importlib.import_module("Main")
+        load_seconds = time.perf_counter() - started
+        main.figure_cache.cache_dir = None
+
+        results = {}
+        for name, sweep in input_sweeps(main).items():
+            if callbacks and name not in callbacks:
+                continue
+            timings, payloads, peaks = [], [], []
+            for args in sweep:
+                call_timings, payload, peak = run_callback(main, name, args, repeat)
+                timings.extend(call_timings)
+                payloads.append(payload)
+                peaks.append(peak)
+            results[name] = summarize(timings, payloads, peaks)
+        return {
+            "rows": rows,
+            "backend": "sqlite" if sql else "pandas",
+            "generate_seconds": round(generate_seconds, 3),
+            "load_seconds": round(load_seconds, 3),
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "callbacks": results,
+        }
+    finally:
+        os.chdir(here)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline):
+    old_sizes = {entry["rows"]: entry for entry in baseline["sizes"]}
+    for entry in current["sizes"]:
+        old = old_sizes.get(entry["rows"])
+        if old is None:
+            continue
+        for name, stats in entry["callbacks"].items():
+            before = old["callbacks"].get(name)
+            if before and before["p50_ms"]:
+                ratio = stats["p50_ms"] / before["p50_ms"]
+                print(f"{entry['rows']:>10,} {name:<22} p50 {before['p50_ms']:>10.2f} -> {stats['p50_ms']:>10.2f} ms  x{ratio:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard callbacks on synthetic data.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma separated row counts, e.g. 10k,100k,1M")
+    parser.add_argument("--repeat", type=int, default=3, help="timed calls per input combination")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--callbacks", help="comma separated callback names (default: all)")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--compare", help="earlier result file to compare p50 latencies against")
+    parser.add_argument("--sql", action="store_true", help="query a SQLite copy of the data (SqlBackend) instead of pandas")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    callbacks = args.callbacks.split(",") if args.callbacks else None
+
+    if args.single is not None:
+        json.dump(run_size(args.single, args.repeat, args.seed, callbacks, args.sql), sys.stdout)
+        return
+
+    sizes = []
+    for rows in (parse_size(size) for size in args.sizes.split(",")):
+        print(f"benchmarking {rows:,} rows", file=sys.stderr)
+        command = [sys.executable, os.path.abspath(__file__), "--single", str(rows), "--repeat", str(args.repeat), "--seed", str(args.seed)]
+        if args.callbacks:
+            command += ["--callbacks", args.callbacks]
+        if args.sql:
+            command.append("--sql")
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(completed.stderr, file=sys.stderr)
+            sys.exit(completed.returncode)
+        sizes.append(json.loads(completed.stdout))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as fh:
+            baseline = json.load(fh)
+    result = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "backend": "sqlite" if args.sql else "pandas",
+        "sizes": sizes,
+    }
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(result, fh, indent=2)
+    print(f"wrote {args.output}", file=sys.stderr)
+    if baseline is not None:
+        compare(result, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import bisect
+import contextvars
+import functools
+import logging
+import math
+import os
+import threading
+import time
+
+from dash.exceptions import PreventUpdate
+
+logger = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7)
+ROWS_BUCKETS = (0, 10, 100, 1e3, 1e4, 1e5, 1e6, 1e7)
+
+# Rows touched by the callback running in this context (None outside an instrumented call)
+_rows_touched = contextvars.ContextVar("rows_touched", default=None)
+
+
+# Called by callbacks with the number of rows they scanned or returned
+def count_rows(n):
+    rows = _rows_touched.get()
+    if rows is not None:
+        rows[0] += int(n)
+
+
+# Prometheus-style cumulative histogram per label value
+class Histogram:
+    def __init__(self, name, help_text, buckets, label="callback"):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.label = label
+        self._series = {}
+        self._lock = threading.Lock()
+        # Fresh lock in forked background jobs (see OrdersStore._reset_locks)
+        os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self._lock:
+            counts, total = self._series.get(label_value, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._series[label_value] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        for label_value, (counts, total) in sorted(series.items()):
+            label = f'{self.label}="{_escape(label_value)}"'
+            running = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                running += count
+                le = "+Inf" if bound == math.inf else repr(float(bound))
+                lines.append(f'{self.name}_bucket{{{label},le="{le}"}} {running}')
+            lines.append(f"{self.name}_sum{{{label}}} {total!r}")
+            lines.append(f"{self.name}_count{{{label}}} {running}")
+        return "\n".join(lines)
+
+
+class Counter:
+    def __init__(self, name, help_text, label="callback"):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    def inc(self, label_value, amount=1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for label_value, value in sorted(values.items()):
+            lines.append(f'{self.name}{{{self.label}="{_escape(label_value)}"}} {value}')
+        return "\n".join(lines)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Timings and payload sizes of every Dash callback of an app.
+# Two wrappers are installed per callback: one around the user function (compute time: the
+# pandas work, cache lookups and figure building, plus the rows it reports via count_rows)
+# and one around Dash's dispatch entry (wall time and JSON response bytes). Serialization
+# time is the difference: what Dash spends encoding the returned figures and components.
+# Background callbacks compute in a separate process, so for them only the request side
+# (job start and polling) is recorded. Metrics are per process.
+class CallbackMetrics:
+    def __init__(self, slow_seconds=None):
+        self.slow_seconds = slow_seconds
+        self.wall = Histogram("dash_callback_seconds", "Wall time of a callback request.", SECONDS_BUCKETS)
+        self.compute = Histogram("dash_callback_compute_seconds", "Time spent in the callback function.", SECONDS_BUCKETS)
+        self.serialize = Histogram("dash_callback_serialize_seconds", "Time Dash spent encoding the callback response.", SECONDS_BUCKETS)
+        self.rows = Histogram("dash_callback_rows", "Rows touched by the callback function.", ROWS_BUCKETS)
+        self.response_bytes = Histogram("dash_callback_response_bytes", "Size of the JSON callback response.", BYTES_BUCKETS)
+        self.errors = Counter("dash_callback_errors_total", "Callback requests that raised an exception.")
+        self._compute_time = contextvars.ContextVar("compute_time", default=None)
+
+    # Replace app.callback so every callback registered from now on is instrumented
+    def instrument(self, app):
+        register = app.callback
+
+        @functools.wraps(register)
+        def callback(*args, **kwargs):
+            # Dash adds the callback_map entry here and fills in its dispatch function below
+            before = set(app.callback_map)
+            decorator = register(*args, **kwargs)
+
+            def wrap(func):
+                result = decorator(self._timed_function(func))
+                for callback_id in set(app.callback_map) - before:
+                    entry = app.callback_map[callback_id]
+                    entry["callback"] = self._timed_dispatch(func.__name__, entry["callback"])
+                return result
+            return wrap
+
+        app.callback = callback
+        return app
+
+    def _timed_function(self, func):
+        name = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            rows_token = _rows_touched.set([0])
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                rows = _rows_touched.get()[0]
+                _rows_touched.reset(rows_token)
+                self.compute.observe(name, elapsed)
+                self.rows.observe(name, rows)
+                cell = self._compute_time.get()
+                if cell is not None:
+                    cell[0] += elapsed
+        return wrapper
+
+    def _timed_dispatch(self, name, dispatch):
+        @functools.wraps(dispatch)
+        def wrapper(*args, **kwargs):
+            cell = [0.0]
+            token = self._compute_time.set(cell)
+            started = time.perf_counter()
+            try:
+                response = dispatch(*args, **kwargs)
+            except PreventUpdate:
+                raise
+            except Exception:
+                self.errors.inc(name)
+                raise
+            finally:
+                self._compute_time.reset(token)
+            elapsed = time.perf_counter() - started
+            size = len(response.encode("utf-8")) if isinstance(response, str) else len(response or b"")
+            self.wall.observe(name, elapsed)
+            self.serialize.observe(name, max(elapsed - cell[0], 0.0))
+            self.response_bytes.observe(name, size)
+            if self.slow_seconds is not None and elapsed >= self.slow_seconds:
+                logger.warning("Slow callback %s: %.3fs, %d response bytes, inputs %r", name, elapsed, size, args)
+            return response
+        return wrapper
+
+    # Prometheus text exposition format (version 0.0.4)
+    def render(self):
+        families = (self.wall, self.compute, self.serialize, self.rows, self.response_bytes, self.errors)
+        return "\n".join(family.render() for family in families) + "\n"
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Bump this whenever the preparation steps below change so stale caches get rebuilt
+CACHE_FORMAT_VERSION = 3
+CACHE_DIR_NAME = ".cache"
+
+# Columns of the Orders sheet that are always stored as categoricals
+ORDERS_CATEGORY_COLUMNS = ['Ship Mode', 'Segment', 'Country', 'Region', 'Category', 'Sub-Category', 'State']
+# Any other string column with at most this share of distinct values becomes categorical too
+CATEGORY_MAX_RATIO = 0.1
+
+
+# Directory that holds the columnar caches, next to the source workbooks
+def cache_dir_for(path):
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+
+
+def _cache_paths(path, sheet_name):
+    base = os.path.splitext(os.path.basename(path))[0]
+    stem = os.path.join(cache_dir_for(path), f"{base}.{sheet_name}")
+    return stem + ".pkl", stem + ".json"
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+# Write to a temp file first so concurrent workers never see a half written cache
+def _atomic_write(path, write):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as fh:
+        write(fh)
+    os.replace(tmp_path, path)
+
+
+def _write_cache(frame, meta, pickle_path, meta_path):
+    os.makedirs(os.path.dirname(pickle_path), exist_ok=True)
+    _atomic_write(pickle_path, lambda fh: pickle.dump(frame, fh, protocol=pickle.HIGHEST_PROTOCOL))
+    _atomic_write(meta_path, lambda fh: fh.write(json.dumps(meta).encode("utf-8")))
+
+
+def _source_meta(path, sheet_name):
+    stat = os.stat(path)
+    return {
+        "format": CACHE_FORMAT_VERSION,
+        "sheet": sheet_name,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+# Load a sheet through the on-disk cache.
+# The cache is keyed on the workbook size/mtime; when those change the content hash is
+# compared before paying for the openpyxl parse, so a plain `touch` does not force a rebuild.
+# A cache marked `"exported": false` holds rows the workbook lacks (compacted without
+# writing the workbook) and is never rebuilt from it: that would drop those rows.
+def load_sheet(path, sheet_name, prepare=None):
+    pickle_path, meta_path = _cache_paths(path, sheet_name)
+    meta = _source_meta(path, sheet_name)
+    cached = _read_meta(meta_path)
+
+    if cached is not None and os.path.exists(pickle_path) and cached.get("format") == meta["format"]:
+        same_stat = cached.get("size") == meta["size"] and cached.get("mtime_ns") == meta["mtime_ns"]
+        if same_stat or cached.get("sha256") == _file_digest(path):
+            try:
+                with open(pickle_path, "rb") as fh:
+                    frame = pickle.load(fh)
+            except Exception as exc:
+                # Truncated, corrupt or written by another pandas version: rebuild it below
+                if cached.get("exported") is False:
+                    raise RuntimeError(f"Cannot read {pickle_path}, which holds rows that are not in {path}") from exc
+                logger.warning("Could not read the cache %s, rebuilding it from %s", pickle_path, path, exc_info=True)
+            else:
+                if not same_stat:
+                    cached.update(size=meta["size"], mtime_ns=meta["mtime_ns"])
+                    _atomic_write(meta_path, lambda fh: fh.write(json.dumps(cached).encode("utf-8")))
+                return frame
+
+    if cached is not None and cached.get("exported") is False:
+        raise RuntimeError(f"{pickle_path} holds rows that are not in {path} and no longer matches it; "
+                           f"restore the cache, or delete {meta_path} to start over from the workbook")
+    frame = pd.read_excel(path, sheet_name=sheet_name)
+    if prepare is not None:
+        frame = prepare(frame)
+    meta["sha256"] = _file_digest(path)
+    _write_cache(frame, meta, pickle_path, meta_path)
+    return frame
+
+
+# Metadata stored next to a sheet's cache (None when there is no cache yet)
+def cached_meta(path, sheet_name):
+    return _read_meta(_cache_paths(path, sheet_name)[1])
+
+
+# Replace a sheet's cache with an already prepared frame, keyed on the workbook as it is
+# on disk right now. `extra` is stored in the metadata (e.g. the last journal entry folded in).
+def save_sheet_cache(path, sheet_name, frame, extra=None):
+    pickle_path, meta_path = _cache_paths(path, sheet_name)
+    meta = _source_meta(path, sheet_name)
+    meta["sha256"] = _file_digest(path)
+    meta.update(extra or {})
+    _write_cache(frame, meta, pickle_path, meta_path)
+
+
+# Orders preparation: typed dates, derived shipping time and categorical dimensions
+def prepare_orders(df):
+    df = parse_order_columns(df)
+    # Keep the rows in Order Date order so date ranges are contiguous slices (see date_index)
+    df = df.sort_values(['Order Date', 'Row ID'], kind='stable').reset_index(drop=True)
+    return normalize_categoricals(df, ORDERS_CATEGORY_COLUMNS)
+
+
+# The row-wise part of prepare_orders (also applied per chunk by order_import)
+def parse_order_columns(df):
+    # Drop the unnamed index column left behind by earlier `to_excel` round trips
+    df = df.loc[:, ~df.columns.astype(str).str.startswith('Unnamed:')]
+    df = df.copy()
+    df['Order Date'] = pd.to_datetime(df['Order Date'], errors='coerce')
+    df['Ship Date'] = pd.to_datetime(df['Ship Date'], errors='coerce')
+    df['Days to Ship'] = (df['Ship Date'] - df['Order Date']).dt.days
+    for col in ['Sales', 'Profit', 'Discount']:
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+    return df
+
+
+# Normalization stage: low-cardinality string columns -> categoricals (smaller frames and
+# equality filters that compare integer codes instead of Python strings)
+def normalize_categoricals(df, always=(), max_ratio=CATEGORY_MAX_RATIO):
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            continue
+        if col in always or (df[col].dtype == object and df[col].nunique() <= max_ratio * len(df)):
+            df[col] = df[col].astype('category')
+    return df
+
+
+def prepare_returns(df):
+    return normalize_categoricals(df.copy(), ['Returned'])
+
+
+def prepare_people(df):
+    return normalize_categoricals(df.copy(), ['Person', 'Region'])
+
+
+def load_orders(path="orders.xlsx"):
+    return load_sheet(path, "Orders", prepare_orders)
+
+
+def load_returns(path="Returns.xlsx"):
+    return load_sheet(path, "Returns", prepare_returns)
+
+
+def load_people(path="Peoples.xlsx"):
+    return load_sheet(path, "People", prepare_people)
@@ -0,0 +1,126 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+
+def _as_datetime64(value):
+    return np.datetime64(pd.Timestamp(value), 'ns')
+
+
+def _sorted_positions(dates):
+    positions = np.argsort(dates, kind='stable')
+    return dates[positions], positions
+
+
+# Range index over the date columns of a frame.
+# For every date column it keeps the dates in sorted order next to the row positions they
+# came from, so a [start, end] query is two binary searches. When a column is already in
+# row order (Order Date, after the loader sorted the frame) the result is a plain iloc slice
+# of the frame instead of a gather. Key columns (Region, Category) get a second level:
+# the same sorted dates/positions, split per distinct value.
+class DateRangeIndex:
+    def __init__(self, df, date_columns=('Order Date', 'Ship Date'), key_columns=('Region', 'Category')):
+        self.df = df
+        self.date_columns = list(date_columns)
+        self.key_columns = list(key_columns)
+        self._dates = {}
+        self._positions = {}
+        self._in_row_order = {}
+        self._keyed = {}
+        for date_col in self.date_columns:
+            self._index_column(date_col)
+
+    def _index_column(self, date_col):
+        dates = self.df[date_col].values.astype('datetime64[ns]')
+        sorted_dates, positions = _sorted_positions(dates)
+        self._dates[date_col] = sorted_dates
+        self._positions[date_col] = positions
+        self._in_row_order[date_col] = bool(np.all(positions[1:] > positions[:-1]))
+        for key_col in self.key_columns:
+            keys = self.df[key_col].values
+            per_value = {}
+            for value in pd.unique(keys[positions]):
+                selected = positions[keys[positions] == value]
+                per_value[value] = (dates[selected], selected)
+            self._keyed[(date_col, key_col)] = per_value
+
+    def __len__(self):
+        return len(self.df)
+
+    # Index for `df`, which is this index's frame with rows appended at the end (the existing
+    # rows must be unchanged). New rows are merged into the sorted arrays with searchsorted +
+    # insert, no re-sort. The current index is left untouched, so threads still querying it
+    # never see half-updated arrays.
+    def extend(self, df):
+        old_len = len(self.df)
+        if len(df) == old_len:
+            return self
+        extended = copy.copy(self)
+        extended.df = df
+        extended._dates = dict(self._dates)
+        extended._positions = dict(self._positions)
+        extended._in_row_order = dict(self._in_row_order)
+        extended._keyed = {key: dict(per_value) for key, per_value in self._keyed.items()}
+        extended._append(old_len)
+        return extended
+
+    def _append(self, old_len):
+        df = self.df
+        new_positions = np.arange(old_len, len(df))
+        for date_col in self.date_columns:
+            new_dates = df[date_col].values[old_len:].astype('datetime64[ns]')
+            order = np.argsort(new_dates, kind='stable')
+            new_dates, added = new_dates[order], new_positions[order]
+            sorted_dates = self._dates[date_col]
+            at = sorted_dates.searchsorted(new_dates, side='right')
+            if self._in_row_order[date_col]:
+                self._in_row_order[date_col] = bool(np.all(at == len(sorted_dates)) and np.all(added[1:] > added[:-1]))
+            self._dates[date_col] = np.insert(sorted_dates, at, new_dates)
+            self._positions[date_col] = np.insert(self._positions[date_col], at, added)
+            for key_col in self.key_columns:
+                per_value = self._keyed[(date_col, key_col)]
+                keys = df[key_col].values[added]
+                for value in pd.unique(keys):
+                    chosen = keys == value
+                    dates, positions = per_value.get(value, (new_dates[:0], added[:0]))
+                    at = dates.searchsorted(new_dates[chosen], side='right')
+                    per_value[value] = (np.insert(dates, at, new_dates[chosen]), np.insert(positions, at, added[chosen]))
+
+    # Earliest and latest date in a column (NaT sorts last, so it is skipped)
+    def bounds(self, date_col):
+        dates = self._dates[date_col]
+        valid = dates.searchsorted(np.datetime64('NaT'), side='left')
+        if not valid:
+            return None, None
+        return pd.Timestamp(dates[0]), pd.Timestamp(dates[valid - 1])
+
+    # Row positions with start <= date_col <= end (sorted by date)
+    def positions(self, date_col, start_date, end_date, key_col=None, key_value=None):
+        if key_col is None:
+            dates, positions = self._dates[date_col], self._positions[date_col]
+        else:
+            empty = self._positions[date_col][:0]
+            dates, positions = self._keyed[(date_col, key_col)].get(key_value, (self._dates[date_col][:0], empty))
+        lo = dates.searchsorted(_as_datetime64(start_date), side='left')
+        hi = dates.searchsorted(_as_datetime64(end_date), side='right')
+        return positions[lo:hi]
+
+    # Rows with start <= date_col <= end and column == value for every filter.
+    # The first filter on an indexed key column is answered by the second level index,
+    # the rest are masks over the k rows already selected.
+    def query(self, date_col, start_date, end_date, filters=None):
+        filters = {col: value for col, value in (filters or {}).items() if value is not None}
+        key_col = next((col for col in filters if col in self.key_columns), None)
+        if key_col is None and self._in_row_order[date_col]:
+            dates = self._dates[date_col]
+            lo = dates.searchsorted(_as_datetime64(start_date), side='left')
+            hi = dates.searchsorted(_as_datetime64(end_date), side='right')
+            result = self.df.iloc[lo:hi]
+        else:
+            positions = self.positions(date_col, start_date, end_date, key_col, filters.get(key_col))
+            result = self.df.take(positions)
+        for column, value in filters.items():
+            if column != key_col:
+                result = result[result[column] == value]
+        return result
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+# Above this many markers the bubble chart is drawn with WebGL (scattergl) instead of SVG
+WEBGL_THRESHOLD = 1000
+# Above this many rows the points are binned on the server before plotting
+MAX_POINTS = 4000
+# Extreme points kept unbinned per colour group and axis end, so outliers stay visible
+OUTLIERS_PER_GROUP = 10
+
+
+# Bin number of every row along one axis, and whether the axis is continuous
+# (numbers and dates are cut into quantile bins, anything else bins on its distinct values)
+def _axis_bins(series, bins):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        series = series.astype('int64').where(series.notna())
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        values = series.to_numpy(dtype='float64', na_value=np.nan)
+        if np.isnan(values).all():
+            return np.zeros(len(values), dtype='int64'), True
+        # Quantile edges: Sales/Profit are heavily skewed, equal-width cells would put
+        # almost every order into a handful of bins
+        edges = np.unique(np.nanquantile(values, np.linspace(0, 1, bins + 1)))
+        return np.clip(np.searchsorted(edges, values, side='right') - 1, 0, max(len(edges) - 2, 0)), True
+    codes, _ = pd.factorize(series, sort=False)
+    return codes, False
+
+
+def _outlier_positions(df, columns, group_col, per_group):
+    keep = set()
+    groups = df.groupby(group_col, observed=True, sort=False).indices if group_col else {None: np.arange(len(df))}
+    for positions in groups.values():
+        for col in columns:
+            values = df[col].to_numpy(dtype='float64', na_value=np.nan)[positions]
+            valid = ~np.isnan(values)
+            if not valid.any():
+                continue
+            ranked = positions[valid][np.argsort(values[valid], kind='stable')]
+            keep.update(ranked[:per_group].tolist())
+            keep.update(ranked[-per_group:].tolist())
+    return np.array(sorted(keep), dtype='int64')
+
+
+# Reduce a scatter frame to roughly `max_points` markers.
+# Points are binned on a grid over (x, y) per colour group: each occupied cell becomes one
+# marker at the cell's mean position with the summed size. Non-numeric axes bin on their
+# distinct values. Per group, the most extreme points on every numeric axis are kept as-is.
+# Returns the frame to plot and the number of input rows it replaced.
+def reduce_points(df, x, y, size=None, color=None, max_points=MAX_POINTS, outliers_per_group=OUTLIERS_PER_GROUP):
+    if len(df) <= max_points:
+        return df, 0
+    groups = df[color].nunique() if color else 1
+    bins = max(2, int(np.sqrt(max_points / max(groups, 1))))
+    x_bins, x_numeric = _axis_bins(df[x], bins)
+    y_bins, y_numeric = _axis_bins(df[y], bins)
+
+    numeric_axes = [col for col in (x, y) if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])]
+    outliers = _outlier_positions(df, numeric_axes, color, outliers_per_group)
+    binned_mask = np.ones(len(df), dtype=bool)
+    binned_mask[outliers] = False
+
+    rest = df.iloc[binned_mask]
+    keys = {'_x_bin': x_bins[binned_mask], '_y_bin': y_bins[binned_mask]}
+    if color:
+        keys[color] = rest[color].to_numpy()
+    grouped = pd.DataFrame(keys, index=rest.index)
+    aggregations = {}
+    for col, numeric in ((x, x_numeric), (y, y_numeric)):
+        if col != color:
+            grouped[col] = rest[col]
+            aggregations[col] = 'mean' if numeric else 'first'
+    if size and size != color and size not in aggregations:
+        grouped[size] = rest[size]
+        aggregations[size] = 'sum'
+    by = ['_x_bin', '_y_bin'] + ([color] if color else [])
+    binned = grouped.groupby(by, observed=True, sort=False).agg(aggregations).reset_index()
+
+    columns = list(dict.fromkeys(col for col in (x, y, size, color) if col))
+    reduced = pd.concat([df.iloc[outliers][columns], binned[columns]], ignore_index=True)
+    return reduced, len(df) - len(reduced)
@@ -0,0 +1,159 @@
+import functools
+import hashlib
+import logging
+import os
+import pickle
+import re
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_MIDNIGHT_DATE = re.compile(r"(\d{4}-\d{2}-\d{2})(?:[T ]00:00:00(?:\.0+)?)?")
+
+
+# Callback inputs -> hashable key. Date pickers send either `2016-01-01` or
+# `2016-01-01T00:00:00` for the same day, so both map to the plain date.
+def normalize_inputs(args):
+    key = []
+    for value in args:
+        if isinstance(value, str):
+            match = _MIDNIGHT_DATE.fullmatch(value)
+            value = match.group(1) if match else value
+        elif isinstance(value, (list, dict)):
+            value = repr(value)
+        key.append(value)
+    return tuple(key)
+
+
+# Digest of the source files the cached results are computed by, so a deploy that changes
+# them does not serve results of the old code from disk
+def code_digest(paths):
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        with open(path, "rb") as fh:
+            digest.update(fh.read())
+    return digest.hexdigest()
+
+
+# LRU cache of callback results (figures, KPI cards) keyed on the callback name, the
+# normalized inputs and the dataset version. Entries for older versions can never be hit
+# again and are dropped as soon as a newer version is seen, so an insert through Add Entry
+# invalidates everything. With `cache_dir` set, results are also pickled to disk; as the
+# dataset version is shared by all workers, one worker's result serves the others. Versions
+# only count inserts, so disk entries are also keyed on the dataset's `source` (what the
+# versions count from, e.g. the workbook contents) and `namespace` (e.g. a code_digest).
+class FigureCache:
+    def __init__(self, max_entries=256, cache_dir=None, max_disk_entries=2048, namespace=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._version = None
+        self._source = None
+        self._lock = threading.Lock()
+        # Fresh lock in forked background jobs (see OrdersStore._reset_locks)
+        os.register_at_fork(after_in_child=self._reset_lock)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    def _disk_path(self, key, version, source):
+        if not self.cache_dir:
+            return None
+        digest = hashlib.sha256(repr((self.namespace, source, version) + key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.pkl")
+
+    # Versions only move forward; a slow request finishing for an older version must not
+    # wipe the entries of the current one. A new source starts the count again.
+    def _set_version(self, version, source):
+        if self._version is None or source != self._source or version > self._version:
+            self._entries.clear()
+            self._version = version
+            self._source = source
+        return version == self._version
+
+    def get(self, key, version, source):
+        with self._lock:
+            if self._set_version(version, source) and key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+        path = self._disk_path(key, version, source)
+        if path:
+            try:
+                with open(path, "rb") as fh:
+                    value = pickle.load(fh)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pass
+            else:
+                self._remember(key, version, source, value)
+                with self._lock:
+                    self.hits += 1
+                return True, value
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def _remember(self, key, version, source, value):
+        with self._lock:
+            if not self._set_version(version, source):
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, key, version, value, source):
+        self._remember(key, version, source, value)
+        path = self._disk_path(key, version, source)
+        if path:
+            try:
+                # Per process and thread: two requests can compute the same figure at once
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as fh:
+                    pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+                self._prune_disk()
+            except (OSError, pickle.PicklingError):
+                logger.warning("Could not write figure cache entry to %s", self.cache_dir, exc_info=True)
+
+    # Keep at most `max_disk_entries` files, removing the least recently written first
+    def _prune_disk(self):
+        entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".pkl")]
+        if len(entries) <= self.max_disk_entries:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[: len(entries) - self.max_disk_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # Decorator for Dash callbacks; `version` is called on every invocation and returns the
+    # current dataset version (it should also bring the data up to date), `source` is called
+    # after it and returns the dataset's source id
+    def memoize(self, version, source):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args):
+                current = version()
+                current_source = source()
+                key = (func.__name__,) + normalize_inputs(args)
+                found, value = self.get(key, current, current_source)
+                if found:
+                    return value
+                value = func(*args)
+                self.put(key, current, value, current_source)
+                return value
+            return wrapper
+        return decorator
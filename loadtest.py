@@ -0,0 +1,641 @@
+import argparse
+import gzip
+import http.client
+import importlib
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+
+import numpy as np
+
+import benchmark
+
+# Load generator for the dashboard server.
+# Every virtual user behaves like one browser tab: it loads the app layout, navigates with
+# display_page, fires the initial callbacks of the page it lands on, and then changes inputs
+# the way a user does (dashboard filters, table filters/sorting/paging, Add Entry, graph
+# axes), sending the same _dash-update-component requests as the Dash renderer, including
+# the callbacks chained through the outputs and the polling of background callbacks.
+# Clientside callbacks run in the browser and are not sent.
+#
+# Targets: Main's Flask test client in this process (the default), a local gunicorn started
+# here (`--gunicorn WORKERS`), or any running server (`--url`). The in-process and gunicorn
+# targets run on a copy of the workbooks (or `--rows` synthetic orders) in a temporary
+# directory, so Add Entry inserts never touch the real data; point `--url` at a copy too.
+# Each `--concurrency` level runs for `--duration` seconds; the report has throughput, tail
+# latency and error rates per callback, and where the throughput stops growing.
+#
+#   python loadtest.py --concurrency 1,2,4,8 --duration 30
+#   python loadtest.py --gunicorn 4 --rows 1M --concurrency 4,8,16,32 --output load.json
+
+DEFAULT_MIX = "navigate=1,dashboard=4,table=3,insert=1,graph=2"
+# Page each action runs on (navigate picks a random page)
+ACTION_PAGES = {"navigate": None, "dashboard": "/", "table": "/Table", "insert": "/Table", "graph": "/graph"}
+PAGES = ["/", "/Table", "/graph"]
+# Report names for the callbacks, by their first output component
+CALLBACK_NAMES = {
+    "page-content": "display_page",
+    "region-dropdown": "restrict_regions",
+    "sales-kpi": "update_kpis",
+    "sales-trend-graph": "update_trend_graphs",
+    "modal": "show_popup",
+    "upload-report": "ingest_upload",
+    "orders-table": "update_table_data",
+    "timeline-graph": "update_timeline",
+    "bubble-chart": "update_bubble_chart",
+}
+FILTER_QUERIES = ["", "{Region} = West", "{Sales} > 500", "{Sales} > 100 && {Segment} = Consumer", "{Customer Name} contains an"]
+SORT_COLUMNS = ["Sales", "Profit", "Order Date", "Customer Name", "Quantity"]
+UPDATE_PATH = "/_dash-update-component"
+
+
+# Flask test client of Main in this process; one per virtual user
+class TestClientTransport:
+    def __init__(self, server):
+        self.client = server.test_client()
+
+    def request(self, method, path, body=None):
+        response = self.client.open(path, method=method, json=body, headers={"Accept-Encoding": "gzip"})
+        return response.status_code, response.headers.get("Content-Encoding"), response.data
+
+    def close(self):
+        pass
+
+
+# One keep-alive HTTP connection per virtual user, like a browser tab
+class HttpTransport:
+    def __init__(self, url, timeout=60):
+        parsed = urllib.parse.urlsplit(url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.prefix = parsed.path.rstrip("/")
+        self.timeout = timeout
+        self.connection = None
+
+    def request(self, method, path, body=None):
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        headers = {"Accept-Encoding": "gzip"}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        try:
+            self.connection.request(method, self.prefix + path, body=data, headers=headers)
+            response = self.connection.getresponse()
+            return response.status, response.getheader("Content-Encoding"), response.read()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def _decode(encoding, data):
+    if encoding == "gzip":
+        data = gzip.decompress(data)
+    return json.loads(data) if data else None
+
+
+def _parse_output(output):
+    if output.startswith(".."):
+        parts = output[2:-2].split("...")
+    else:
+        parts = [output]
+    return [tuple(part.rsplit(".", 1)) for part in parts]
+
+
+# A server-side callback from /_dash-dependencies
+class CallbackSpec:
+    def __init__(self, dependency):
+        self.output = dependency["output"]
+        self.outputs = _parse_output(self.output)
+        self.multi = self.output.startswith("..")
+        self.inputs = [(item["id"], item["property"]) for item in dependency["inputs"]]
+        self.state = [(item["id"], item["property"]) for item in dependency["state"]]
+        self.prevent_initial_call = dependency.get("prevent_initial_call", False)
+        first_id, first_prop = self.outputs[0]
+        self.name = CALLBACK_NAMES.get(first_id, "search_dropdown_options" if first_prop == "options" else self.output)
+
+    def components(self):
+        return {component for component, _ in self.inputs}
+
+
+# Latencies and errors of every callback call, and the (time, error) of every user that
+# failed outside a callback call, shared by all users of one level
+class Recorder:
+    def __init__(self):
+        self.calls = []
+        self.failures = []
+        self._lock = threading.Lock()
+
+    def record(self, name, started, seconds, requests, error):
+        with self._lock:
+            self.calls.append((name, started, seconds, requests, error))
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures.append((time.time(), error))
+
+
+# A browser tab: the props of the components on the current page and the callbacks to fire
+class VirtualUser:
+    def __init__(self, transport, callbacks, recorder, rng, poll_interval, callback_timeout):
+        self.transport = transport
+        self.callbacks = callbacks
+        self.recorder = recorder
+        self.rng = rng
+        self.poll_interval = poll_interval
+        self.callback_timeout = callback_timeout
+        self.props = {}
+        self.app_components = set()
+        self.page_components = set()
+        self.page = None
+        self.page_defaults = {}
+        self.clicks = 0
+
+    def start(self):
+        status, encoding, data = self.transport.request("GET", "/_dash-layout")
+        if status != 200:
+            raise RuntimeError(f"/_dash-layout answered {status}")
+        self.app_components = self._register(_decode(encoding, data))
+
+    # Collect id -> props of every component in a layout tree
+    def _register(self, node):
+        found = set()
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(node)
+            elif isinstance(node, dict) and "props" in node:
+                props = node["props"]
+                if isinstance(props.get("id"), str):
+                    self.props[props["id"]] = dict(props)
+                    found.add(props["id"])
+                stack.extend(value for value in props.values() if isinstance(value, (list, dict)))
+        return found
+
+    def get(self, component, prop, default=None):
+        return self.props.get(component, {}).get(prop, default)
+
+    def _on_page(self, spec):
+        return spec.components() <= (self.app_components | self.page_components)
+
+    def _set(self, component, prop, value):
+        current = self.props.setdefault(component, {})
+        if isinstance(value, dict) and "__dash_patch_update" in value:
+            items = list(current.get(prop) or [])
+            for operation in value.get("operations", []):
+                if operation["location"] == [] and operation["operation"] in ("Append", "Extend"):
+                    new = operation["params"]["value"]
+                    items.extend(new if operation["operation"] == "Extend" else [new])
+            value = items
+        current[prop] = value
+        if component == "page-content" and prop == "children":
+            for old in self.page_components:
+                self.props.pop(old, None)
+            self.page_components = self._register(value)
+
+    # One callback, polling until a background job has finished or `callback_timeout` has
+    # passed (recorded as an error, so one stuck job does not stall the user). Returns the
+    # updated props.
+    def _call(self, spec, changed):
+        body = {
+            "output": spec.output,
+            "outputs": [{"id": c, "property": p} for c, p in spec.outputs] if spec.multi else {"id": spec.outputs[0][0], "property": spec.outputs[0][1]},
+            "inputs": [{"id": c, "property": p, "value": self.get(c, p)} for c, p in spec.inputs],
+            "state": [{"id": c, "property": p, "value": self.get(c, p)} for c, p in spec.state],
+            "changedPropIds": [f"{c}.{p}" for c, p in sorted(changed)],
+        }
+        started = time.time()
+        clock = time.perf_counter()
+        requests, error, result = 0, None, None
+        path = UPDATE_PATH
+        try:
+            while True:
+                status, encoding, data = self.transport.request("POST", path, body)
+                requests += 1
+                if status == 204:
+                    break
+                if status != 200:
+                    error = f"HTTP {status}"
+                    break
+                result = _decode(encoding, data)
+                if "cacheKey" in result and "response" not in result:
+                    if time.perf_counter() - clock > self.callback_timeout:
+                        error = "timeout"
+                        break
+                    path = f"{UPDATE_PATH}?cacheKey={result['cacheKey']}&job={result['job']}"
+                    time.sleep(self.poll_interval)
+                    continue
+                break
+        except Exception as exc:
+            error = type(exc).__name__
+        self.recorder.record(spec.name, started, time.perf_counter() - clock, requests, error)
+        updated = []
+        if error is None and result and "response" in result:
+            for component, values in result["response"].items():
+                for prop, value in values.items():
+                    self._set(component, prop, value)
+                    updated.append((component, prop))
+        return updated
+
+    # Fire the callbacks triggered by the `changed` props and then, like the renderer, the
+    # ones their outputs trigger, each only once every callback feeding its inputs is done.
+    # A new page fires the initial calls of the callbacks with inputs on it.
+    def fire(self, changed):
+        pending = {}
+        self._trigger(pending, set(changed))
+        while pending:
+            outputs = {output for spec in pending for output in spec.outputs}
+            ready = [spec for spec in pending if not set(spec.inputs) & outputs] or list(pending)[:1]
+            for spec in ready:
+                updated = set(self._call(spec, pending.pop(spec)))
+                if ("page-content", "children") in updated:
+                    for other in self.callbacks:
+                        if not other.prevent_initial_call and other.components() & self.page_components and self._on_page(other):
+                            pending.setdefault(other, set())
+                self._trigger(pending, updated)
+
+    def _trigger(self, pending, changed):
+        for spec in self.callbacks:
+            if changed & set(spec.inputs) and self._on_page(spec):
+                pending.setdefault(spec, set()).update(changed & set(spec.inputs))
+
+    def navigate(self, path):
+        self.props.setdefault("url", {})["pathname"] = path
+        self.fire([("url", "pathname")])
+        self.page = path
+        # Date bounds of the page as first rendered, for picking ranges
+        if path == "/":
+            self.page_defaults[path] = (self.get("start-date-picker", "date"), self.get("end-date-picker", "date"))
+        elif path == "/graph":
+            picker = self.props.get("graph-date-picker-range", {})
+            self.page_defaults[path] = (picker.get("min_date_allowed"), picker.get("max_date_allowed"))
+
+    def _date_range(self):
+        first, last = self.page_defaults.get(self.page, (None, None))
+        if not first or not last:
+            return first, last
+        first, last = np.datetime64(first[:10]), np.datetime64(last[:10])
+        days = int((last - first).astype(int))
+        span = self.rng.choice([days, 365, 90, 30])
+        start = first + np.timedelta64(self.rng.randint(0, max(days - span, 0)), "D")
+        return str(start), str(min(start + np.timedelta64(span, "D"), last))
+
+    def _option(self, component, allow_none=True):
+        values = [option["value"] if isinstance(option, dict) else option for option in self.get(component, "options") or []]
+        if allow_none:
+            values.append(None)
+        return self.rng.choice(values) if values else None
+
+    def act(self, action):
+        page = ACTION_PAGES[action]
+        if page is None:
+            self.navigate(self.rng.choice(PAGES))
+            return
+        if self.page != page:
+            self.navigate(page)
+        getattr(self, f"_{action}")()
+
+    def _dashboard(self):
+        start, end = self._date_range()
+        changes = {
+            ("start-date-picker", "date"): start,
+            ("end-date-picker", "date"): end,
+            ("region-dropdown", "value"): self._option("region-dropdown"),
+            ("manager-dropdown", "value"): self._option("manager-dropdown"),
+            ("granularity-dropdown", "value"): self._option("granularity-dropdown", allow_none=False),
+        }
+        self._change(changes, self.rng.randint(1, 3))
+
+    def _table(self):
+        page_count = self.get("orders-table", "page_count") or 1
+        sort_by = []
+        if self.rng.random() < 0.5:
+            sort_by = [{"column_id": self.rng.choice(SORT_COLUMNS), "direction": self.rng.choice(["asc", "desc"])}]
+        changes = {
+            ("category-dropdown", "value"): self._option("category-dropdown"),
+            ("sub-category-dropdown", "value"): self._option("sub-category-dropdown"),
+            ("orders-table", "filter_query"): self.rng.choice(FILTER_QUERIES),
+            ("orders-table", "sort_by"): sort_by,
+            ("orders-table", "page_current"): self.rng.randint(0, min(page_count, 50) - 1),
+        }
+        self._change(changes, self.rng.randint(1, 2))
+
+    # Fill in the Add Entry form with a new Order ID and click the button
+    def _insert(self):
+        day = np.datetime64("2017-12-01") + np.timedelta64(self.rng.randint(0, 30), "D")
+        category = self.rng.choice(list(benchmark.SUB_CATEGORIES))
+        form = {
+            "row-id": str(self.rng.randint(10**6, 10**9)), "order-id": f"LOAD-{uuid.uuid4().hex[:12]}",
+            "days-to-ship": 2, "ship-mode": self.rng.choice(benchmark.SHIP_MODES), "customer-id": "LT-00001",
+            "customer-name": "Load Test", "segment": self.rng.choice(benchmark.SEGMENTS), "country": "United States",
+            "city": "Seattle", "state": "Washington", "postal-code": 98103, "region": "West", "product-id": "LT-0001",
+            "category": category, "sub-category": self.rng.choice(benchmark.SUB_CATEGORIES[category]),
+            "product-name": "Load test item", "sales": round(self.rng.uniform(5, 500), 2), "quantity": self.rng.randint(1, 5),
+            "discount": 0.0, "profit": round(self.rng.uniform(-20, 100), 2),
+        }
+        for component, value in form.items():
+            self.props.setdefault(component, {})["value"] = value
+        self.props.setdefault("order-date", {})["date"] = str(day)
+        self.props.setdefault("ship-date", {})["date"] = str(day + np.timedelta64(2, "D"))
+        self.clicks += 1
+        self.props.setdefault("add-entry-button", {})["n_clicks"] = self.clicks
+        self.fire([("add-entry-button", "n_clicks")])
+
+    def _graph(self):
+        start, end = self._date_range()
+        changes = {
+            ("graph-date-picker-range", "start_date"): start,
+            ("graph-date-picker-range", "end_date"): end,
+            ("graph-time-axis-dropdown", "value"): self._option("graph-time-axis-dropdown", allow_none=False),
+            ("graph-granularity-dropdown", "value"): self._option("graph-granularity-dropdown", allow_none=False),
+            ("x-axis-dropdown", "value"): self._option("x-axis-dropdown", allow_none=False),
+            ("y-axis-dropdown", "value"): self._option("y-axis-dropdown", allow_none=False),
+        }
+        self._change(changes, self.rng.randint(1, 2))
+
+    # Apply `count` of the changes at once (one renderer update) and fire what they trigger
+    def _change(self, changes, count):
+        picked = self.rng.sample(sorted(changes), min(count, len(changes)))
+        for component, prop in picked:
+            self.props.setdefault(component, {})[prop] = changes[(component, prop)]
+        self.fire(picked)
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        action, _, weight = part.partition("=")
+        if action not in ACTION_PAGES:
+            raise SystemExit(f"unknown action {action!r}; expected one of {', '.join(ACTION_PAGES)}")
+        mix[action] = float(weight or 1)
+    return mix
+
+
+# One virtual user until the deadline. A user that fails (e.g. /_dash-layout answering 500)
+# is recorded and replaced by a new one, so the level keeps its number of users.
+def _user_loop(make_transport, callbacks, recorder, mix, seed, deadline, poll_interval, callback_timeout):
+    rng = random.Random(seed)
+    actions, weights = list(mix), list(mix.values())
+    while time.time() < deadline:
+        transport = make_transport()
+        user = VirtualUser(transport, callbacks, recorder, rng, poll_interval, callback_timeout)
+        try:
+            user.start()
+            user.navigate(rng.choice(PAGES))
+            while time.time() < deadline:
+                user.act(rng.choices(actions, weights)[0])
+        except Exception as exc:
+            recorder.record_failure(repr(exc))
+            time.sleep(poll_interval)
+        finally:
+            transport.close()
+
+
+def summarize(recorder, measured_from, measured_to):
+    seconds = max(measured_to - measured_from, 1e-9)
+    by_name = {}
+    requests = 0
+    for name, started, elapsed, call_requests, error in recorder.calls:
+        if measured_from <= started < measured_to:
+            by_name.setdefault(name, []).append((elapsed, error))
+            requests += call_requests
+    callbacks = {}
+    total_calls = total_errors = 0
+    for name, calls in sorted(by_name.items()):
+        ms = np.array([elapsed for elapsed, _ in calls]) * 1000.0
+        errors = sum(1 for _, error in calls if error)
+        total_calls += len(calls)
+        total_errors += errors
+        callbacks[name] = {
+            "calls": len(calls),
+            "per_second": round(len(calls) / seconds, 2),
+            "error_rate": round(errors / len(calls), 4),
+            "p50_ms": round(float(np.percentile(ms, 50)), 2),
+            "p90_ms": round(float(np.percentile(ms, 90)), 2),
+            "p99_ms": round(float(np.percentile(ms, 99)), 2),
+            "max_ms": round(float(ms.max()), 2),
+        }
+    all_ms = np.array([elapsed for calls in by_name.values() for elapsed, _ in calls]) * 1000.0
+    # A failed user counts as one failed call
+    failures = [error for failed, error in recorder.failures if measured_from <= failed < measured_to]
+    attempts = total_calls + len(failures)
+    return {
+        "calls_per_second": round(total_calls / seconds, 2),
+        "requests_per_second": round(requests / seconds, 2),
+        "error_rate": round((total_errors + len(failures)) / attempts, 4) if attempts else 0.0,
+        "user_failures": failures,
+        "p50_ms": round(float(np.percentile(all_ms, 50)), 2) if len(all_ms) else None,
+        "p99_ms": round(float(np.percentile(all_ms, 99)), 2) if len(all_ms) else None,
+        "callbacks": callbacks,
+    }
+
+
+def run_level(make_transport, callbacks, concurrency, duration, warmup, mix, seed, poll_interval, callback_timeout):
+    recorder = Recorder()
+    started = time.time()
+    deadline = started + warmup + duration
+    threads = [
+        threading.Thread(target=_user_loop, daemon=True,
+                         args=(make_transport, callbacks, recorder, mix, seed * 1000 + i, deadline, poll_interval, callback_timeout))
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result = summarize(recorder, started + warmup, deadline)
+    result["concurrency"] = concurrency
+    return result
+
+
+def print_level(result):
+    print(f"\nconcurrency {result['concurrency']}: {result['calls_per_second']:.1f} callbacks/s, "
+          f"{result['requests_per_second']:.1f} requests/s, p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, "
+          f"errors {result['error_rate']:.2%}")
+    print(f"  {'callback':<26}{'calls':>7}{'/s':>8}{'err':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  ms")
+    for name, stats in result["callbacks"].items():
+        print(f"  {name:<26}{stats['calls']:>7}{stats['per_second']:>8.1f}{stats['error_rate']:>8.1%}"
+              f"{stats['p50_ms']:>9.1f}{stats['p90_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['max_ms']:>9.1f}")
+    for failure in result["user_failures"]:
+        print(f"  user failed and was restarted: {failure}")
+
+
+# The lowest concurrency after which more users add less than 10% throughput
+def saturation(levels):
+    best = None
+    for previous, current in zip(levels, levels[1:]):
+        if current["calls_per_second"] < previous["calls_per_second"] * 1.1:
+            return previous["concurrency"]
+        best = current["concurrency"]
+    return best
+
+
+# Workbooks for the server in `workdir`: a copy of the ones next to this file, or synthetic
+# orders written the way the benchmark does
+def prepare_data(workdir, rows, seed):
+    here = os.path.dirname(os.path.abspath(__file__))
+    if rows is None:
+        for name in ("orders.xlsx", "Returns.xlsx", "Peoples.xlsx"):
+            shutil.copy(os.path.join(here, name), os.path.join(workdir, name))
+        return
+    sys.path.insert(0, here)
+    data_loader = importlib.import_module("data_loader")
+    orders, returns, people = benchmark.synthetic_orders(rows, seed)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        benchmark.write_sheet("orders.xlsx", "Orders", orders, data_loader.prepare_orders)
+        benchmark.write_sheet("Returns.xlsx", "Returns", returns, data_loader.prepare_returns)
+        benchmark.write_sheet("Peoples.xlsx", "People", people, data_loader.prepare_people)
+    finally:
+        os.chdir(cwd)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(workdir, workers, threads, timeout):
+    if importlib.util.find_spec("gunicorn") is None:
+        raise SystemExit("--gunicorn needs gunicorn installed (pip install gunicorn)")
+    port = _free_port()
+    here = os.path.dirname(os.path.abspath(__file__))
+    command = [sys.executable, "-m", "gunicorn", "--workers", str(workers), "--threads", str(threads),
+               "--bind", f"127.0.0.1:{port}", "--chdir", workdir, "--pythonpath", here, "Main:server"]
+    process = subprocess.Popen(command, cwd=workdir)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"gunicorn exited with {process.returncode}")
+        try:
+            status, _, _ = HttpTransport(url, timeout=5).request("GET", "/_dash-dependencies")
+            if status == 200:
+                return process, url
+        except OSError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise SystemExit(f"gunicorn did not answer within {timeout}s")
+
+
+# Background callback jobs the in-process app forked and that are still running: stop them
+# before their working directory goes away
+def _stop_background_jobs():
+    try:
+        import multiprocess
+    except ImportError:
+        return
+    for child in multiprocess.active_children():
+        child.terminate()
+        child.join(5)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay dashboard callback traffic and report throughput and latency.")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="comma separated numbers of virtual users, one run each")
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds per concurrency level")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds at the start of each level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"action weights, default {DEFAULT_MIX}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--poll-interval", type=float, default=0.2, help="seconds between polls of a background callback")
+    parser.add_argument("--callback-timeout", type=float, default=60.0, help="seconds before a background callback counts as failed")
+    parser.add_argument("--url", help="load a running server instead, e.g. http://127.0.0.1:8050")
+    parser.add_argument("--gunicorn", type=int, metavar="WORKERS", help="start a local gunicorn with this many workers")
+    parser.add_argument("--gunicorn-threads", type=int, default=1)
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--rows", type=benchmark.parse_size, help="synthetic orders (e.g. 1M) instead of a copy of the workbooks")
+    parser.add_argument("--background", action="store_true", help="run the figure callbacks as background jobs (DASHBOARD_BACKGROUND=1)")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+    mix = parse_mix(args.mix)
+    levels = [int(level) for level in args.concurrency.split(",")]
+    if args.background:
+        os.environ["DASHBOARD_BACKGROUND"] = "1"
+
+    workdir = process = None
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        if args.url:
+            target = args.url
+            make_transport = lambda: HttpTransport(args.url)
+        else:
+            workdir = tempfile.mkdtemp(prefix="dash-load-")
+            prepare_data(workdir, args.rows, args.seed)
+            if args.gunicorn:
+                target = f"gunicorn, {args.gunicorn} workers x {args.gunicorn_threads} threads"
+                process, url = start_gunicorn(workdir, args.gunicorn, args.gunicorn_threads, args.startup_timeout)
+                make_transport = lambda: HttpTransport(url)
+            else:
+                target = "Flask test client (in process)"
+                sys.path.insert(0, here)
+                os.chdir(workdir)
+                server = importlib.import_module("Main").server
+                make_transport = lambda: TestClientTransport(server)
+
+        probe = make_transport()
+        status, encoding, data = probe.request("GET", "/_dash-dependencies")
+        probe.close()
+        if status != 200:
+            raise SystemExit(f"/_dash-dependencies answered {status}")
+        callbacks = [CallbackSpec(dependency) for dependency in _decode(encoding, data) if not dependency.get("clientside_function")]
+
+        print(f"target: {target}; mix: {args.mix}", file=sys.stderr)
+        results = []
+        for concurrency in levels:
+            print(f"running {concurrency} users for {args.warmup + args.duration:.0f}s", file=sys.stderr)
+            result = run_level(make_transport, callbacks, concurrency, args.duration, args.warmup, mix, args.seed, args.poll_interval,
+                               args.callback_timeout)
+            print_level(result)
+            results.append(result)
+        saturated = saturation(results)
+        if len(results) > 1:
+            print(f"\nthroughput stops growing at {saturated} users" if saturated != results[-1]["concurrency"]
+                  else f"\nthroughput still growing at {saturated} users; try higher --concurrency")
+
+        if output:
+            with open(output, "w", encoding="utf-8") as fh:
+                json.dump({
+                    "commit": benchmark._git_commit(),
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "cpus": os.cpu_count(),
+                    "target": target,
+                    "rows": args.rows,
+                    "mix": mix,
+                    "duration": args.duration,
+                    "saturation_concurrency": saturated,
+                    "levels": results,
+                }, fh, indent=2)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        os.chdir(here)
+        _stop_background_jobs()
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
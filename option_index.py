@@ -0,0 +1,56 @@
+import bisect
+
+import pandas as pd
+
+
+# Sorted, case-insensitive prefix index over the distinct values of one column.
+# A search is a binary search to the first key with the prefix followed by a walk over at
+# most `limit` matches, so typeahead cost does not depend on how many values there are.
+class PrefixIndex:
+    def __init__(self, values=()):
+        distinct = {str(value) for value in pd.unique(pd.Series(values, dtype=object)) if not pd.isna(value)}
+        pairs = sorted((value.casefold(), value) for value in distinct)
+        self._keys = [key for key, _ in pairs]
+        self._values = [value for _, value in pairs]
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, value):
+        key = str(value).casefold()
+        i = bisect.bisect_left(self._keys, key)
+        while i < len(self._keys) and self._keys[i] == key:
+            if self._values[i] == value:
+                return True
+            i += 1
+        return False
+
+    # Index with `values` added; the current index is not modified (readers may hold it)
+    def with_values(self, values):
+        new = [str(value) for value in values if not pd.isna(value) and value not in self]
+        if not new:
+            return self
+        extended = PrefixIndex()
+        extended._keys = list(self._keys)
+        extended._values = list(self._values)
+        for value in dict.fromkeys(new):
+            i = bisect.bisect_left(extended._keys, value.casefold())
+            extended._keys.insert(i, value.casefold())
+            extended._values.insert(i, value)
+        return extended
+
+    def search(self, prefix, limit=50):
+        prefix = (prefix or '').casefold()
+        start = bisect.bisect_left(self._keys, prefix)
+        matches = []
+        for i in range(start, min(start + limit, len(self._keys))):
+            if not self._keys[i].startswith(prefix):
+                break
+            matches.append(self._values[i])
+        return matches
+
+
+# PrefixIndex.search over several indexes (parts of one column), in the same order
+def search_all(indexes, prefix, limit=50):
+    matches = {value for index in indexes for value in index.search(prefix, limit)}
+    return sorted(matches, key=lambda value: (value.casefold(), value))[:limit]
@@ -0,0 +1,167 @@
+import base64
+import io
+import os
+import sys
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+import data_loader
+from orders_store import DERIVED_COLUMNS
+
+# Rows read, prepared and appended at a time; memory use is bounded by one chunk
+CHUNK_ROWS = 20_000
+
+
+def _sheet(workbook, sheet_name):
+    if sheet_name is None:
+        sheet_name = "Orders" if "Orders" in workbook.sheetnames else workbook.sheetnames[0]
+    return workbook[sheet_name]
+
+
+# Header + rows of a sheet in chunks. openpyxl's read-only mode streams the sheet XML,
+# so the workbook is never loaded whole.
+def iter_xlsx_chunks(path, sheet_name=None, chunk_rows=CHUNK_ROWS):
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = _sheet(workbook, sheet_name).iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name) if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+        chunk = []
+        for row in rows:
+            if any(value is not None for value in row):
+                chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                yield pd.DataFrame.from_records(chunk, columns=columns)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame.from_records(chunk, columns=columns)
+    finally:
+        workbook.close()
+
+
+def iter_csv_chunks(path, chunk_rows=CHUNK_ROWS):
+    yield from pd.read_csv(path, chunksize=chunk_rows, encoding_errors="replace")
+
+
+def _is_csv(filename):
+    return os.path.splitext(filename)[1].lower() in (".csv", ".txt")
+
+
+def iter_chunks(path, sheet_name=None, chunk_rows=CHUNK_ROWS):
+    if _is_csv(path):
+        return iter_csv_chunks(path, chunk_rows)
+    return iter_xlsx_chunks(path, sheet_name, chunk_rows)
+
+
+# prepare_orders for one chunk: the same typing and derived Days to Ship, without the
+# whole-frame steps (sorting, categoricals) that the store does on load
+def prepare_chunk(chunk, columns):
+    chunk = data_loader.parse_order_columns(chunk.reindex(columns=columns))
+    for col in ['Row ID', 'Postal Code', 'Quantity']:
+        chunk[col] = pd.to_numeric(chunk[col], errors='coerce').astype('float64')
+    chunk['Order ID'] = chunk['Order ID'].astype(str).where(chunk['Order ID'].notna(), None)
+    return chunk
+
+
+def _keys(frame):
+    return list(zip(frame['Order ID'].astype(str), frame['Row ID']))
+
+
+# Data rows in a sheet as recorded in the workbook's dimension (None for CSV or when unknown)
+def _row_count(path, sheet_name):
+    if _is_csv(path):
+        return None
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        max_row = _sheet(workbook, sheet_name).max_row
+        return max(max_row - 1, 0) if max_row else None
+    finally:
+        workbook.close()
+
+
+# Stream a workbook or CSV into the backend chunk by chunk. Rows whose (Order ID, Row ID)
+# is already in the data, or earlier in the file, are skipped; only the key set is kept
+# across chunks. `progress(rows_read, rows_total, inserted, skipped)` is called after every
+# chunk (rows_total is None when it is not known up front, e.g. for CSV).
+def import_orders(backend, path, sheet_name=None, chunk_rows=CHUNK_ROWS, progress=None):
+    backend.refresh()
+    columns = [col for col in backend.columns() if col not in DERIVED_COLUMNS]
+    seen = backend.order_keys()
+    total = _row_count(path, sheet_name)
+    rows_read = inserted = skipped = 0
+    for chunk in iter_chunks(path, sheet_name, chunk_rows):
+        rows_read += len(chunk)
+        chunk = prepare_chunk(chunk, columns)
+        keys = _keys(chunk)
+        fresh = np.array([key not in seen for key in keys], dtype=bool) & ~pd.Series(keys).duplicated().to_numpy()
+        new_rows = chunk[fresh]
+        if len(new_rows):
+            backend.append_rows(new_rows)
+            seen.update(_keys(new_rows))
+        inserted += len(new_rows)
+        skipped += len(chunk) - len(new_rows)
+        if progress is not None:
+            progress(rows_read, total, inserted, skipped)
+    return inserted, skipped
+
+
+def print_progress(rows_read, rows_total, inserted, skipped):
+    done = f"{rows_read:,}/{rows_total:,}" if rows_total else f"{rows_read:,}"
+    print(f"\rread {done} rows, {inserted:,} added, {skipped:,} duplicates skipped", end="", file=sys.stderr, flush=True)
+
+
+# Columns an order row cannot be added without, and the typed columns whose cells must parse
+REQUIRED_COLUMNS = ['Row ID', 'Order ID', 'Order Date', 'Ship Date', 'Sales', 'Quantity']
+DATE_COLUMNS = ['Order Date', 'Ship Date']
+NUMBER_COLUMNS = ['Row ID', 'Postal Code', 'Sales', 'Quantity', 'Discount', 'Profit']
+
+
+# The rows of a dcc.Upload `contents` string (CSV, or the Orders/first sheet of a workbook)
+def read_upload(contents, filename):
+    data = io.BytesIO(base64.b64decode(contents.split(",", 1)[1]))
+    chunks = list(iter_csv_chunks(data) if _is_csv(filename) else iter_xlsx_chunks(data))
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+
+# Why each row of a prepared chunk cannot be added ('' for valid rows). `raw` is the chunk
+# before prepare_chunk, to tell a missing cell from one that did not parse. Every check is
+# one vectorized comparison over the whole chunk.
+def validate_chunk(raw, chunk, known_order_ids):
+    checks = [(chunk[col].isna() & raw[col].isna(), f"{col} is missing") for col in REQUIRED_COLUMNS]
+    checks += [(chunk[col].isna() & raw[col].notna(), f"{col} is not a date") for col in DATE_COLUMNS]
+    checks += [(chunk[col].isna() & raw[col].notna(), f"{col} is not a number") for col in NUMBER_COLUMNS]
+    checks += [
+        (chunk['Ship Date'] < chunk['Order Date'], "Ship Date is before Order Date"),
+        (chunk['Order ID'].isin(known_order_ids), "Order ID already exists"),
+        (pd.Series(_keys(chunk), index=chunk.index).duplicated() & chunk['Order ID'].notna(), "repeats an earlier (Order ID, Row ID)"),
+    ]
+    reasons = pd.Series("", index=chunk.index, dtype=object)
+    for failed, reason in checks:
+        failed = failed.to_numpy(dtype=bool)
+        reasons[failed] = reasons[failed] + reason + "; "
+    return reasons.str.removesuffix("; ")
+
+
+# Validate uploaded rows and append the valid ones as one batch (one journal write or one
+# transaction). Returns the number of rows added and the rejected rows with their reasons;
+# `Row` counts data rows from 1, blank rows of a workbook excluded.
+def ingest_orders(backend, raw):
+    backend.refresh()
+    columns = [col for col in backend.columns() if col not in DERIVED_COLUMNS]
+    raw = raw.reindex(columns=columns).reset_index(drop=True)
+    chunk = prepare_chunk(raw, columns)
+    order_ids = chunk['Order ID'].dropna().unique()
+    while True:
+        reasons = validate_chunk(raw, chunk, backend.known_order_ids(order_ids))
+        valid = chunk[(reasons == "").to_numpy()]
+        if valid.empty or backend.append_rows_if_absent(valid) is not None:
+            break
+        # Another worker added one of these Order IDs since the check: check again
+        backend.refresh()
+    rejected = (reasons != "").to_numpy()
+    report = pd.DataFrame({'Row': raw.index[rejected] + 1, 'Order ID': raw['Order ID'][rejected], 'Reason': reasons[rejected]})
+    return len(valid), report
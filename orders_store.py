@@ -0,0 +1,431 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import data_loader
+import date_index
+import option_index
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_NAME = "orders.journal.sqlite"
+# Joined at load from the Returns and People sheets; never written back to the workbook
+RETURNED_COLUMN = "Returned"
+MANAGER_COLUMN = "Regional Manager"
+DERIVED_COLUMNS = [RETURNED_COLUMN, MANAGER_COLUMN]
+
+
+def _json_default(value):
+    if isinstance(value, (pd.Timestamp, datetime, date)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+# Append-only journal of inserted order rows, kept in a local SQLite file.
+# An insert is a single small INSERT (no rewrite of the workbook); rows are folded into the
+# canonical store by OrdersStore.compact and then removed from the journal. The file is the
+# shared source of truth for every worker process: the highest sequence number is the
+# dataset version, and workers catch up by reading the entries after the last one they applied.
+class OrdersJournal:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS entries (seq INTEGER PRIMARY KEY AUTOINCREMENT, record TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+            conn.execute("CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('journal_id', ?)", (uuid.uuid4().hex,))
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # Append records in one transaction and return their sequence numbers
+    def append(self, records):
+        with self._connect() as conn:
+            return self._insert(conn, records)
+
+    def _insert(self, conn, records):
+        return [
+            conn.execute("INSERT INTO entries (record) VALUES (?)", (json.dumps(record, default=_json_default),)).lastrowid
+            for record in records
+        ]
+
+    # `append`, unless an entry after `after_seq` has one of `order_ids`: the check and the
+    # insert are one write transaction, so two workers cannot both pass it. Returns None on
+    # such an entry, and also when entries after `after_seq` have been compacted away (the
+    # caller has to catch up and check its own data again).
+    def append_if_absent(self, records, order_ids, after_seq):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            compacted = conn.execute("SELECT value FROM meta WHERE key = 'compacted_seq'").fetchone()
+            if compacted and compacted[0] > after_seq:
+                return None
+            for (record,) in conn.execute("SELECT record FROM entries WHERE seq > ?", (after_seq,)):
+                if json.loads(record).get('Order ID') in order_ids:
+                    return None
+            return self._insert(conn, records)
+
+    # (seq, record) pairs written after `seq`, oldest first
+    def read_since(self, seq=0):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT seq, record FROM entries WHERE seq > ? ORDER BY seq", (seq,)).fetchall()
+        return [(row_seq, json.loads(record)) for row_seq, record in rows]
+
+    # Highest sequence number ever handed out (survives truncation) and the highest one
+    # folded into the canonical store, read in one go
+    def positions(self):
+        with self._connect() as conn:
+            last = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'entries'").fetchone()
+            compacted = conn.execute("SELECT value FROM meta WHERE key = 'compacted_seq'").fetchone()
+        return (last[0] if last else 0), (compacted[0] if compacted else 0)
+
+    # Random id given to the journal when its file was created: sequence numbers restart
+    # when the file is replaced, so they only identify a dataset together with this id
+    def journal_id(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT value FROM meta WHERE key = 'journal_id'").fetchone()[0]
+
+    # Record that everything up to `upto_seq` is in the canonical store and drop those entries
+    def truncate(self, upto_seq):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE seq <= ?", (upto_seq,))
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('compacted_seq', ?)", (upto_seq,))
+
+    # Cross-process mutual exclusion (e.g. one compactor across gunicorn workers).
+    # A lease expires after `ttl` seconds so a crashed holder cannot block the others forever.
+    def acquire_lease(self, name, owner, ttl):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT owner, expires FROM leases WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[0] != owner and row[1] > now:
+                return False
+            conn.execute("INSERT OR REPLACE INTO leases (name, owner, expires) VALUES (?, ?, ?)", (name, owner, now + ttl))
+            return True
+
+    def release_lease(self, name, owner):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+
+# Turn journal records (dicts keyed by column name) into rows typed like `like`
+def records_to_frame(records, like):
+    rows = pd.DataFrame.from_records(list(records), columns=like.columns)
+    for col, dtype in like.dtypes.items():
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            rows[col] = pd.to_datetime(rows[col], errors='coerce')
+        elif pd.api.types.is_numeric_dtype(dtype):
+            rows[col] = pd.to_numeric(rows[col], errors='coerce')
+    derived = (rows['Ship Date'] - rows['Order Date']).dt.days
+    rows['Days to Ship'] = rows['Days to Ship'].fillna(derived)
+    return rows
+
+
+# Add the joined columns. On a categorical Region the manager lookup maps the handful of
+# categories, not every row, and the result stays categorical.
+def enrich_orders(frame, returned_order_ids, region_managers):
+    return frame.assign(**{
+        RETURNED_COLUMN: frame['Order ID'].isin(returned_order_ids),
+        MANAGER_COLUMN: frame['Region'].map(region_managers).astype('category'),
+    })
+
+
+# Append rows to a frame without losing its categorical columns
+# (a plain concat of a categorical and an object column falls back to object)
+def concat_orders(frame, rows):
+    rows = rows.copy()
+    for col, dtype in frame.dtypes.items():
+        if not isinstance(dtype, pd.CategoricalDtype):
+            continue
+        new_values = pd.Index(rows[col].dropna().unique()).difference(dtype.categories)
+        if len(new_values):
+            dtype = pd.CategoricalDtype(dtype.categories.append(new_values))
+            frame = frame.assign(**{col: frame[col].cat.set_categories(dtype.categories)})
+        rows[col] = rows[col].astype(dtype)
+    return pd.concat([frame, rows], ignore_index=True)
+
+
+def _concat_parts(parts):
+    frame = parts[0].frame
+    for part in parts[1:]:
+        frame = concat_orders(frame, part.frame)
+    return frame
+
+
+# Rows of several frames from DateRangeIndex.query, merged into one frame in date order.
+# `columns` picks the columns before the merge, so only those are copied.
+def merge_by_date(results, date_col, columns=None):
+    results = [result for result in results if len(result)] or results[:1]
+    rows = [result if columns is None else result[columns] for result in results]
+    if len(rows) == 1:
+        return rows[0]
+    merged = rows[0]
+    for more in rows[1:]:
+        merged = concat_orders(merged, more)
+    # Each result is sorted by date already, so the stable sort only merges the runs
+    dates = np.concatenate([result[date_col].to_numpy(dtype='datetime64[ns]') for result in results])
+    return merged.iloc[np.argsort(dates, kind='stable')]
+
+
+# One part of the in-memory dataset with the read structures built over it: the date index,
+# the daily cube and its prefix sums, Order ID -> row positions and the typeahead indexes.
+class OrdersPart:
+    def __init__(self, frame, searchable_columns=()):
+        self.frame = frame
+        self.index = date_index.DateRangeIndex(frame)
+        self.cube = aggregates.build_daily_cube(frame)
+        self.prefix_sums = aggregates.PrefixSums(self.cube)
+        self.order_rows = frame.groupby('Order ID', sort=False).indices
+        self.options = {col: option_index.PrefixIndex(frame[col]) for col in searchable_columns}
+
+    def __len__(self):
+        return len(self.frame)
+
+
+# In-memory orders dataset plus its write path.
+# Reads see the canonical store (the columnar cache of orders.xlsx) merged with every
+# journal entry that has not been compacted yet. The two are kept as separate `parts`: the
+# canonical store with its index and cube, built at load, and a delta holding the journal
+# rows, rebuilt on each insert at a cost that grows with the delta only. Queries answer
+# from each part and merge the results. A background thread periodically writes the merged
+# frame back to the cache (and, optionally, orders.xlsx), truncates the journal and folds
+# the delta into the canonical part.
+#
+# Several worker processes can each hold an OrdersStore on the same files. Inserts always go
+# through the journal and are applied in sequence order by `refresh`, so every worker ends up
+# with the same rows in the same order; `version` is the last journal sequence applied and is
+# therefore comparable across workers. Parts are replaced, never mutated, so threads reading
+# `parts` never see a half-applied insert.
+class OrdersStore:
+    def __init__(self, xlsx_path="orders.xlsx", journal_path=None, export_xlsx=True, searchable_columns=(),
+                 returned_order_ids=(), region_managers=None):
+        self.xlsx_path = xlsx_path
+        self.export_xlsx = export_xlsx
+        self.searchable_columns = list(searchable_columns)
+        # Order IDs from the Returns sheet, joined onto every row as the boolean `Returned`
+        self.returned_order_ids = frozenset(returned_order_ids)
+        # Region -> regional manager (People sheet), joined onto every row
+        self.region_managers = dict(region_managers or {})
+        self.journal = OrdersJournal(journal_path or os.path.join(data_loader.cache_dir_for(xlsx_path), JOURNAL_NAME))
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        # Background callback jobs are forked from a request thread; a lock another thread
+        # held at that moment would never be released in the job process
+        os.register_at_fork(after_in_child=self._reset_locks)
+        self._wake = threading.Event()
+        self._max_pending = None
+        self._owner = f"{socket.gethostname()}:{os.getpid()}:{id(self)}"
+        with self._lock:
+            self._load()
+
+    def _reset_locks(self):
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+
+    # (Re)build everything from the canonical store, then replay the journal on top
+    def _load(self):
+        frame = self._enrich(data_loader.load_orders(self.xlsx_path))
+        meta = data_loader.cached_meta(self.xlsx_path, "Orders") or {}
+        # A cache rebuilt from a workbook edited outside the app (or written between a
+        # compaction's workbook replace and its cache save) does not say which entries it
+        # holds; entries up to the last compaction are gone from the journal either way, so
+        # start there, or refresh() would see them as unseen and reload on every call
+        self._applied_seq = meta["journal_seq"] if "journal_seq" in meta else self.journal.positions()[1]
+        self._compacted_seq = self._applied_seq
+        # The workbook contents the cache started from; compaction carries it over, so it
+        # only changes when the workbook is edited outside the app
+        self._origin = meta.get("origin") or meta.get("sha256")
+        self.source_id = f"{self._origin}:{self.journal.journal_id()}"
+        self._parts = (OrdersPart(frame, self.searchable_columns),)
+        # Journal sequence number of every row of the delta part
+        self._delta_seqs = np.zeros(0, dtype='int64')
+        self._replay(trusted_seq="journal_seq" in meta)
+
+    def _enrich(self, frame):
+        return enrich_orders(frame, self.returned_order_ids, self.region_managers)
+
+    # The canonical part, then the delta part when there are journal rows. Read it once per
+    # query: the tuple is replaced as a whole on every insert and compaction.
+    @property
+    def parts(self):
+        return self._parts
+
+    # Every row as one frame. Copies the whole dataset while a delta exists; queries use
+    # `parts` (and `query`) instead.
+    @property
+    def frame(self):
+        return _concat_parts(self._parts)
+
+    # Rows with start <= date_col <= end from every part, in date order
+    def query(self, date_col, start_date, end_date, columns=None):
+        return merge_by_date([part.index.query(date_col, start_date, end_date) for part in self._parts], date_col, columns)
+
+    # Dataset version: the last journal sequence number reflected in `frame`. Versions are
+    # only comparable between stores with the same `source_id`.
+    @property
+    def version(self):
+        return self._applied_seq
+
+    # Apply journal entries left over from a previous run. If the cache was rebuilt from the
+    # workbook we cannot tell which entries were already exported, so rows that are already
+    # present (same Order ID and Row ID) are skipped.
+    def _replay(self, trusted_seq):
+        entries = self.journal.read_since(self._applied_seq)
+        if not entries:
+            return
+        last_seq = entries[-1][0]
+        if not trusted_seq:
+            frame = self._parts[0].frame
+            present = set(zip(frame['Order ID'].astype(str), frame['Row ID'].astype(str)))
+            entries = [(seq, r) for seq, r in entries if (str(r.get('Order ID')), str(r.get('Row ID'))) not in present]
+        self._apply(last_seq, entries)
+
+    # Add (seq, record) journal entries to the delta part; the canonical part is not touched.
+    # The delta keeps its own dtypes: casting it to the canonical categoricals would cost
+    # as much as their categories on every insert.
+    def _apply(self, last_seq, entries):
+        if entries:
+            base = self._parts[0]
+            rows = self._enrich(records_to_frame([record for _, record in entries], base.frame.iloc[:0].drop(columns=DERIVED_COLUMNS)))
+            if len(self._parts) > 1:
+                rows = concat_orders(self._parts[1].frame, rows)
+            self._delta_seqs = np.concatenate([self._delta_seqs, np.array([seq for seq, _ in entries], dtype='int64')])
+            self._parts = (base, OrdersPart(rows, self.searchable_columns))
+        self._applied_seq = max(self._applied_seq, last_seq)
+        if self._max_pending is not None and self._applied_seq - self._compacted_seq >= self._max_pending:
+            self._wake.set()
+
+    # Catch up with inserts made by any worker since the last refresh. Cheap when nothing
+    # changed (one indexed SQLite lookup); if another worker compacted entries this process
+    # has not seen yet, the canonical store is reloaded instead.
+    def refresh(self):
+        last_seq, compacted_seq = self.journal.positions()
+        if last_seq <= self._applied_seq:
+            return self.version
+        with self._lock:
+            if compacted_seq > self._applied_seq:
+                self._load()
+            else:
+                self._compacted_seq = max(self._compacted_seq, compacted_seq)
+                entries = self.journal.read_since(self._applied_seq)
+                if entries:
+                    self._apply(entries[-1][0], entries)
+        return self.version
+
+    # Order ID -> row positions in `frame`, from the parts' own lookups
+    def has_order(self, order_id):
+        return any(order_id in part.order_rows for part in self._parts)
+
+    def order_positions(self, order_id):
+        positions, start = [], 0
+        for part in self._parts:
+            positions += [start + int(position) for position in part.order_rows.get(order_id, ())]
+            start += len(part)
+        return positions
+
+    # Insert order rows: one journal write, then the journal is replayed from the last applied
+    # entry, which also picks up rows other workers inserted in between
+    def append(self, records):
+        records = list(records)
+        with self._lock:
+            seqs = self.journal.append(records)
+            self.refresh()
+        return seqs
+
+    # Insert the records only if none of their Order IDs is known yet, in this process or any
+    # other: the Order IDs are checked against the data applied so far, and the journal checks
+    # the entries after it in the same transaction as the insert. When the journal refuses,
+    # the store catches up and checks again, which tells a duplicate from a stale view.
+    def append_if_absent(self, records):
+        records = list(records)
+        order_ids = {record.get('Order ID') for record in records}
+        with self._lock:
+            while True:
+                self.refresh()
+                if any(self.has_order(order_id) for order_id in order_ids):
+                    return None
+                seqs = self.journal.append_if_absent(records, order_ids, self._applied_seq)
+                if seqs is not None:
+                    break
+            self.refresh()
+        return seqs
+
+    # Fold everything applied so far into the canonical store and drop it from the journal.
+    # Only the worker holding the compaction lease does this.
+    def compact(self):
+        with self._compact_lock:
+            if not self.journal.acquire_lease("compaction", self._owner, ttl=600):
+                return False
+            try:
+                self.refresh()
+                with self._lock:
+                    parts, seq = self._parts, self._applied_seq
+                _, compacted_seq = self.journal.positions()
+                if seq <= compacted_seq:
+                    return False
+                frame = _concat_parts(parts).sort_values(['Order Date', 'Row ID'], kind='stable').reset_index(drop=True)
+                snapshot = frame.drop(columns=DERIVED_COLUMNS)
+                if self.export_xlsx:
+                    tmp_path = os.path.splitext(self.xlsx_path)[0] + ".compacting.xlsx"
+                    snapshot.to_excel(tmp_path, sheet_name="Orders", index=False)
+                    os.replace(tmp_path, self.xlsx_path)
+                data_loader.save_sheet_cache(self.xlsx_path, "Orders", snapshot, {"journal_seq": seq, "origin": self._origin, "exported": self.export_xlsx})
+                self.journal.truncate(seq)
+                # Built outside the lock: reads and inserts go on against the old parts
+                base = OrdersPart(frame, self.searchable_columns)
+                with self._lock:
+                    self._compacted_seq = max(self._compacted_seq, seq)
+                    if self._parts[0] is parts[0]:
+                        self._fold(base, seq)
+                return True
+            finally:
+                self.journal.release_lease("compaction", self._owner)
+
+    # Make `base` (the rows up to journal entry `seq`, as just compacted) the canonical part;
+    # delta rows of later entries stay in the delta
+    def _fold(self, base, seq):
+        later = self._delta_seqs > seq
+        self._delta_seqs = self._delta_seqs[later]
+        if not later.any():
+            self._parts = (base,)
+            return
+        delta = self._parts[1].frame[later].reset_index(drop=True)
+        self._parts = (base, OrdersPart(delta, self.searchable_columns))
+
+    # Run compaction in a daemon thread every `interval` seconds, or sooner once
+    # `max_pending` rows are waiting
+    def start_compactor(self, interval=60.0, max_pending=1000):
+        self._max_pending = max_pending
+
+        def run():
+            while True:
+                self._wake.wait(interval)
+                self._wake.clear()
+                try:
+                    self.compact()
+                except Exception:
+                    logger.exception("Compacting the orders journal failed")
+
+        thread = threading.Thread(target=run, name="orders-compactor", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,77 @@
+import io
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export needs pyarrow; CSV works without it
+    pa = pq = None
+
+# Streaming encoders for the Table page download (the /export route in Main.py). Both take
+# the chunks of a backend's iter_table_rows and yield the file piece by piece, so an export
+# holds one chunk at a time however many rows it has.
+
+
+def parquet_available():
+    return pq is not None
+
+
+def csv_chunks(chunks, columns):
+    yield pd.DataFrame(columns=columns).to_csv(index=False)
+    for chunk in chunks:
+        yield chunk.to_csv(header=False, index=False, columns=columns)
+
+
+# Write-only file that hands out what has been written since the last take()
+class _Sink(io.RawIOBase):
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+# Categoricals as their plain values, so every row group has the same column types
+def _plain(chunk, columns):
+    chunk = chunk[columns]
+    categorical = {col: chunk[col].cat.categories.dtype for col in columns if isinstance(chunk[col].dtype, pd.CategoricalDtype)}
+    return chunk.astype(categorical) if categorical else chunk
+
+
+# The schema of the first chunk; columns with no values in it are written as strings
+def _schema(chunk):
+    schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+    return pa.schema([pa.field(field.name, pa.string()) if pa.types.is_null(field.type) else field for field in schema])
+
+
+# One row group per chunk
+def parquet_chunks(chunks, columns):
+    sink = _Sink()
+    writer = schema = None
+    for chunk in chunks:
+        chunk = _plain(chunk, columns)
+        if writer is None:
+            schema = _schema(chunk)
+            writer = pq.ParquetWriter(sink, schema)
+        writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        yield sink.take()
+    if writer is None:
+        writer = pq.ParquetWriter(sink, _schema(pd.DataFrame(columns=columns)))
+    writer.close()
+    yield sink.take()
@@ -0,0 +1,151 @@
+import pandas as pd
+
+# Operators understood by the DataTable filter row, in the order they have to be matched
+# (longer tokens first so that `>=` is not read as `>`)
+FILTER_OPERATORS = [
+    ['ge ', '>='],
+    ['le ', '<='],
+    ['lt ', '<'],
+    ['gt ', '>'],
+    ['ne ', '!='],
+    ['eq ', '='],
+    ['contains '],
+    ['datestartswith '],
+]
+
+
+# Split one `{column} op value` part of a DataTable filter_query into its pieces
+def split_filter_part(filter_part):
+    for operator_type in FILTER_OPERATORS:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+
+                value_part = value_part.strip()
+                v0 = value_part[0] if value_part else ''
+                if v0 and v0 == value_part[-1] and v0 in ("'", '"', '`'):
+                    value = value_part[1: -1].replace('\\' + v0, v0)
+                elif operator_type[0] in ('contains ', 'datestartswith '):
+                    # text operators keep the literal (`2016` must not become `2016.0`)
+                    value = value_part
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+
+                # word operators need spaces after them in the filter string,
+                # but we don't want these later
+                return name, operator_type[0].strip(), value
+
+    return [None] * 3
+
+
+# Categorical columns are unordered, so range comparisons run on the plain values
+def _comparable(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype(series.cat.categories.dtype)
+    return series
+
+
+def _kind(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'datetime'
+    if pd.api.types.is_numeric_dtype(series):
+        return 'number'
+    return 'text'
+
+
+# A range operand as the column's kind of value ('datetime', 'number' or 'text'), or None
+# when it is not one (`{Order Date} > abc`): the part then matches no rows
+def range_operand(value, kind):
+    if isinstance(value, float) and value.is_integer():
+        # `{Order Date} > 2016` is the year, `{Order ID} > 5` the text "5"
+        value = str(int(value))
+    if kind == 'datetime':
+        value = pd.to_datetime(str(value), errors='coerce')
+        return None if pd.isna(value) else value
+    if kind == 'number':
+        value = pd.to_numeric(value, errors='coerce')
+        return None if pd.isna(value) else float(value)
+    return str(value)
+
+
+# Boolean mask for the whole filter_query (parts are joined with `&&`)
+def filter_mask(df, filter_query):
+    mask = pd.Series(True, index=df.index)
+    if not filter_query:
+        return mask
+    for filter_part in filter_query.split(' && '):
+        col_name, operator, filter_value = split_filter_part(filter_part)
+        if col_name not in df.columns:
+            continue
+        series = df[col_name]
+        if operator in ('eq', 'ne'):
+            part = series == filter_value
+            if operator == 'ne':
+                part = ~part
+        elif operator in ('lt', 'le', 'gt', 'ge'):
+            series = _comparable(series)
+            kind = _kind(series)
+            operand = range_operand(filter_value, kind)
+            if operand is None:
+                part = pd.Series(False, index=df.index)
+            elif kind == 'text':
+                # Missing cells never match (NaN cannot be compared with a string)
+                part = series.notna() & getattr(series.astype(str), operator)(operand)
+            else:
+                part = getattr(series, operator)(operand)
+        elif operator == 'contains':
+            part = series.astype(str).str.contains(str(filter_value), regex=False, na=False)
+        elif operator == 'datestartswith':
+            part = series.astype(str).str.startswith(str(filter_value), na=False)
+        else:
+            continue
+        mask &= part
+    return mask
+
+
+def apply_filter_query(df, filter_query):
+    if not filter_query:
+        return df
+    return df[filter_mask(df, filter_query)]
+
+
+def apply_sort(df, sort_by):
+    if not sort_by:
+        return df
+    sort_by = [col for col in sort_by if col['column_id'] in df.columns]
+    if not sort_by:
+        return df
+    return df.sort_values(
+        [col['column_id'] for col in sort_by],
+        ascending=[col['direction'] == 'asc' for col in sort_by],
+        kind='stable',
+        na_position='last',
+    )
+
+
+# Number of pages for `total_rows` rows (at least one, so the pager never shows 0 of 0)
+def page_count(total_rows, page_size):
+    return max(1, -(-total_rows // page_size))
+
+
+# Slice out a single page; the page number is clamped so a shrinking filter never
+# leaves the table on an empty page
+def get_page(df, page_current, page_size):
+    start, stop = page_bounds(len(df), page_current, page_size)
+    return df.iloc[start: stop]
+
+
+# Row range [start, stop) of that page
+def page_bounds(total_rows, page_current, page_size):
+    page_current = min(page_current or 0, page_count(total_rows, page_size) - 1)
+    start = page_current * page_size
+    return start, start + page_size
+
+
+# "Order ID/Row ID" of each row of a page, to tell which rows the browser already has
+def row_keys(page):
+    return (page['Order ID'].astype(str) + "/" + page['Row ID'].astype(str)).tolist()
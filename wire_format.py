@@ -0,0 +1,130 @@
+import functools
+import gzip
+import os
+
+import dash
+import flask
+import numpy as np
+# Imported at startup, not by plotly on the first encode: two request threads importing it
+# at once can see a partially initialized module (no attribute 'OPT_NON_STR_KEYS')
+import orjson  # noqa: F401
+import pandas as pd
+from dash.development.base_component import Component
+from plotly.basedatatypes import BaseFigure
+
+try:
+    import brotli
+except ImportError:  # responses are gzip-compressed only
+    brotli = None
+
+# Responses smaller than this are sent as they are; compressing them gains nothing
+COMPRESS_MIN_BYTES = 1024
+# Levels for on-the-fly compression: most of the size reduction for a fraction of the CPU
+# of the maximum levels
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+COMPRESSED_PATHS = ("/_dash-update-component",)
+
+_NoUpdate = type(dash.no_update)
+# Values orjson writes as they are
+_PLAIN = {str, int, float, bool, type(None)}
+
+
+# Callback results -> plain dicts, lists and contiguous numpy arrays. Dash encodes every
+# response with plotly's orjson encoder, which first tries orjson on the value as it is and,
+# when that fails on a component, figure, object array or Timestamp anywhere in it, falls
+# back to a pure-Python clean of the whole response. With the results converted here the
+# first attempt succeeds: numeric and datetime arrays are written by orjson directly.
+# Float arrays in figure data are rounded to `decimals` places when it is set.
+def to_wire(value, decimals=None, in_figure=False):
+    if isinstance(value, _NoUpdate):
+        return value
+    if isinstance(value, BaseFigure):
+        # The figure's own property dicts: to_plotly_json() would deep-copy them first, and
+        # the walk below already builds new containers
+        return {'data': to_wire(value._data, decimals, True), 'layout': to_wire(value._layout)}
+    if isinstance(value, Component):
+        return to_wire(value.to_plotly_json(), decimals, in_figure)
+    if isinstance(value, dict):
+        return {key: to_wire(item, decimals, in_figure) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if not (in_figure and decimals is not None) and all(type(item) in _PLAIN for item in value):
+            return list(value)
+        return [to_wire(item, decimals, in_figure) for item in value]
+    if isinstance(value, (pd.Series, pd.Index)):
+        value = value.to_numpy()
+    if isinstance(value, np.ndarray):
+        return _array(value, decimals if in_figure else None)
+    if value is pd.NaT:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if in_figure and decimals is not None and isinstance(value, float):
+        return round(value, decimals)
+    if hasattr(value, 'to_plotly_json'):
+        return to_wire(value.to_plotly_json(), decimals, in_figure)
+    return value
+
+
+def _array(values, decimals):
+    if values.dtype == object:
+        if pd.api.types.infer_dtype(values, skipna=True) == 'string':
+            return values.tolist()
+        return [to_wire(item) for item in values.tolist()]
+    if decimals is not None and values.dtype.kind == 'f':
+        values = np.round(values, decimals)
+    return np.ascontiguousarray(values)
+
+
+# Float precision of figure arrays on the wire, e.g. DASHBOARD_FIGURE_DECIMALS=2
+def figure_decimals():
+    decimals = os.environ.get("DASHBOARD_FIGURE_DECIMALS")
+    return int(decimals) if decimals else None
+
+
+# Replace app.callback so every callback registered from now on returns wire-ready values
+def install(app, decimals=None):
+    register = app.callback
+
+    @functools.wraps(register)
+    def callback(*args, **kwargs):
+        decorator = register(*args, **kwargs)
+
+        def wrap(func):
+            @functools.wraps(func)
+            def wire_result(*func_args, **func_kwargs):
+                return to_wire(func(*func_args, **func_kwargs), decimals)
+            return decorator(wire_result)
+        return wrap
+
+    app.callback = callback
+    app.server.after_request(compress_response)
+    return app
+
+
+def _encoding():
+    accept = flask.request.accept_encodings
+    if brotli is not None and accept.quality("br") > 0:
+        return "br"
+    if accept.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+
+# gzip or brotli, as the client accepts, for callback responses
+def compress_response(response):
+    if not flask.request.path.endswith(COMPRESSED_PATHS):
+        return response
+    response.vary.add("Accept-Encoding")
+    if response.status_code != 200 or response.direct_passthrough or "Content-Encoding" in response.headers:
+        return response
+    encoding = _encoding()
+    data = response.get_data()
+    if encoding is None or len(data) < COMPRESS_MIN_BYTES:
+        return response
+    if encoding == "br":
+        response.set_data(brotli.compress(data, quality=BROTLI_QUALITY))
+    else:
+        response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+    response.headers["Content-Encoding"] = encoding
+    return response